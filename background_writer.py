@@ -0,0 +1,53 @@
+import queue
+import threading
+
+
+class BackgroundWriter:
+    """后台写入线程：提交的条目由线程按批取出后交给write_batch写入，提交方不等待磁盘IO
+
+    一次取出已积压的条目（最多batch_size条）合并写入，积压越多每条的刷新、fsync或事务开销越小。
+    on_start和on_exit在线程中于第一次写入前、最后一次写入后调用，用于打开和释放只在线程中使用的资源。
+    """
+
+    def __init__(self, write_batch, name, error_message, batch_size=200, on_start=None, on_exit=None):
+        self.write_batch = write_batch
+        self.error_message = error_message
+        self.batch_size = batch_size
+        self.on_start = on_start
+        self.on_exit = on_exit
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def put(self, item):
+        self._queue.put(item)
+
+    def _run(self):
+        try:
+            if self.on_start is not None:
+                self.on_start()
+            while True:
+                item = self._queue.get()
+                items = [item]
+                while item is not None and len(items) < self.batch_size:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    items.append(item)
+                try:
+                    self.write_batch([item for item in items if item is not None])
+                except Exception as e:
+                    print(f"{self.error_message}: {str(e)}")
+                if items[-1] is None:
+                    break
+        finally:
+            if self.on_exit is not None:
+                self.on_exit()
+
+    def close(self, timeout=None):
+        """写完已提交的条目后结束线程，返回线程是否已结束"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+        return not self._thread.is_alive()
@@ -0,0 +1 @@
+"""吞吐量基准测试：本地模拟的chat/completions服务和驱动真实翻译流程的测试脚本"""
@@ -0,0 +1,239 @@
+import json
+import math
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from packing import SINGLE_MESSAGE_TEMPLATE
+from token_utils import estimate_message_tokens, estimate_tokens
+
+_MARKER_PATTERN = re.compile(r'^@@(\d+)@@[ \t]*(.*?)(?=^@@\d+@@|\Z)', re.M | re.S)
+_SINGLE_PREFIX = SINGLE_MESSAGE_TEMPLATE.format("")
+
+
+@dataclass
+class MockServerConfig:
+    """模拟服务的行为参数"""
+    latency_median: float = 0.2  # 返回首个token前的等待时间中位数（秒）
+    latency_sigma: float = 0.6  # 等待时间服从对数正态分布，sigma越大长尾越明显
+    tokens_per_second: float = 300.0  # 每个请求输出token的速度
+    output_ratio: float = 1.4  # 译文token数与原文token数之比
+    rate_limit_ratio: float = 0.0  # 返回429的请求比例
+    retry_after: float = 1.0  # 429响应的Retry-After（秒）
+    truncate_ratio: float = 0.0  # 回复在结束前断开的请求比例
+    reasoning_chars: int = 0  # 流式响应在译文之前输出的思考过程（reasoning_content）字数，模拟推理模型
+    seed: int = 0
+
+
+class MockStats:
+    def __init__(self):
+        self.requests = 0
+        self.rate_limited = 0
+        self.truncated = 0
+        self.completion_tokens = 0
+
+
+def _source_paragraphs(content):
+    """从翻译请求中取出原文段落：合并请求按@@编号@@拆分，单段请求去掉前缀"""
+    matches = _MARKER_PATTERN.findall(content)
+    if matches:
+        return [(int(number), text.strip()) for number, text in matches]
+    if content.startswith(_SINGLE_PREFIX):
+        content = content[len(_SINGLE_PREFIX):]
+    return [(None, content)]
+
+
+def build_translation(content, output_ratio, max_tokens):
+    """生成与原文长度成比例的模拟译文，保留合并请求的编号；超过max_tokens时截断，返回(译文, 是否截断)"""
+    parts = []
+    for number, paragraph in _source_paragraphs(content):
+        text = "译" * max(1, int(estimate_tokens(paragraph) * output_ratio))
+        parts.append(f"@@{number}@@ {text}" if number is not None else text)
+    translation = "\n\n".join(parts)
+    if max_tokens and estimate_tokens(translation) > max_tokens:
+        return translation[:max_tokens], True
+    return translation, False
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length") or 0)
+        payload = json.loads(self.rfile.read(length))
+        config = server.config
+        with server.lock:
+            server.stats.requests += 1
+            rate_limited = server.random.random() < config.rate_limit_ratio
+            truncated = not rate_limited and server.random.random() < config.truncate_ratio
+            first_token_delay = server.random.lognormvariate(math.log(config.latency_median), config.latency_sigma)
+
+        if rate_limited:
+            with server.lock:
+                server.stats.rate_limited += 1
+            self._send_json(429, {"error": {"message": "rate limit exceeded"}},
+                            {"Retry-After": f"{config.retry_after:g}"})
+            return
+
+        messages = payload.get("messages") or []
+        content = messages[-1]["content"] if messages else ""
+        translation, length_limited = build_translation(content, config.output_ratio, payload.get("max_tokens"))
+        completion_tokens = estimate_tokens(translation)
+        usage = {
+            "prompt_tokens": estimate_message_tokens(messages),
+            "completion_tokens": completion_tokens
+        }
+        with server.lock:
+            server.stats.completion_tokens += completion_tokens
+            if truncated:
+                server.stats.truncated += 1
+        finish_reason = "length" if length_limited else "stop"
+        generation_seconds = completion_tokens / config.tokens_per_second
+
+        time.sleep(first_token_delay)
+        if payload.get("stream"):
+            self._send_stream(translation, finish_reason, usage, generation_seconds, truncated, config.reasoning_chars)
+            return
+
+        time.sleep(generation_seconds)
+        body = {
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": translation},
+                         "finish_reason": finish_reason}],
+            "usage": usage
+        }
+        if truncated:
+            # 非流式响应只返回一半的响应体后断开
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data[:len(data) // 2])
+            self.close_connection = True
+            return
+        self._send_json(200, body)
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, translation, finish_reason, usage, generation_seconds, truncated, reasoning_chars=0):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        chunk_count = max(1, min(20, len(translation) // 20))
+        size = math.ceil(len(translation) / chunk_count)
+        pieces = [translation[i:i + size] for i in range(0, len(translation), size)] or [""]
+        if truncated:
+            pieces = pieces[:max(1, len(pieces) // 2)]
+        delay = generation_seconds / len(pieces)
+        try:
+            if reasoning_chars:
+                self._write_event({"choices": [{"index": 0, "delta": {"content": None, "reasoning_content": "思" * reasoning_chars},
+                                                "finish_reason": None}]})
+            for piece in pieces:
+                time.sleep(delay)
+                self._write_event({"choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]})
+            if truncated:
+                # 在结束标记前断开连接
+                self.wfile.write(b"0\r\n\r\n")
+                self.close_connection = True
+                return
+            self._write_event({"choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}]})
+            self._write_event({"choices": [], "usage": usage})
+            self._write_chunk(b"data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端取消请求（如对冲请求落败）
+            self.close_connection = True
+
+    def _write_event(self, data):
+        self._write_chunk(f"data: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8"))
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+class MockChatServer:
+    """兼容OpenAI chat/completions接口的本地模拟服务，在后台线程中运行"""
+
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.config = config or MockServerConfig()
+        self._server.stats = MockStats()
+        self._server.lock = threading.Lock()
+        self._server.random = random.Random(self._server.config.seed)
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/chat/completions"
+
+    @property
+    def stats(self):
+        return self._server.stats
+
+    def reset(self, config=None):
+        """换用新的行为参数并清零统计"""
+        with self._server.lock:
+            if config is not None:
+                self._server.config = config
+            self._server.stats = MockStats()
+            self._server.random = random.Random(self._server.config.seed)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-chat-server", daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="本地模拟的chat/completions服务")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-median", type=float, default=0.2)
+    parser.add_argument("--latency-sigma", type=float, default=0.6)
+    parser.add_argument("--tokens-per-second", type=float, default=300.0)
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0)
+    parser.add_argument("--truncate-ratio", type=float, default=0.0)
+    args = parser.parse_args()
+    server = MockChatServer(MockServerConfig(
+        latency_median=args.latency_median,
+        latency_sigma=args.latency_sigma,
+        tokens_per_second=args.tokens_per_second,
+        rate_limit_ratio=args.rate_limit_ratio,
+        truncate_ratio=args.truncate_ratio
+    ), port=args.port)
+    print(f"模拟服务地址: {server.start()}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
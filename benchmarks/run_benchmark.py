@@ -0,0 +1,214 @@
+"""吞吐量基准测试
+
+在本地启动模拟的chat/completions服务，用真实的翻译流程（解析、分章节调度、请求、合并）
+翻译合成论文或指定的论文，按不同并发数输出每小时论文数、每秒请求数、发送的token数和尾部耗时，
+并与保存的基线比较，吞吐下降或尾部耗时上升超过容差时以非零状态退出。
+
+    python -m benchmarks.run_benchmark
+    python -m benchmarks.run_benchmark --parallel 4,8,16 --rate-limit-ratio 0.05 --truncate-ratio 0.02
+    python -m benchmarks.run_benchmark --save-baseline
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import request_engine
+from benchmarks.mock_server import MockChatServer, MockServerConfig
+from benchmarks.synthetic_papers import write_papers
+from log_pipeline import ERROR
+from translator_engine import EngineListener, TranslationConfig, TranslationEngine
+
+BENCHMARK_PROVIDER = "Deepseek"
+BENCHMARK_MODEL = "deepseek-chat"
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def run_once(papers, parallel, args, work_dir):
+    """以指定并发数翻译一遍所有论文，返回统计结果"""
+    config = TranslationConfig(
+        api_provider=BENCHMARK_PROVIDER,
+        # 每次运行使用不同的Key，避免上一次运行中429触发的暂停影响本次
+        api_key=f"benchmark-{parallel}-{time.monotonic_ns()}",
+        model=BENCHMARK_MODEL,
+        max_tokens=args.max_tokens,
+        parallel_count=parallel,
+        result_path=os.path.join(work_dir, "result"),
+        cache_path=os.path.join(work_dir, "cache"),
+        pack_paragraphs=args.pack,
+        use_translation_memory=False,
+        stream=not args.no_stream,
+        backoff_base=args.backoff_base,
+        max_active_files=0
+    )
+    engine = TranslationEngine(config, EngineListener(ERROR))
+    started = time.monotonic()
+    jobs = engine.translation_process(papers)
+    wall = time.monotonic() - started
+
+    metrics = engine.metrics
+    latency = metrics.histogram("request_seconds", outcome="ok")
+    completion = metrics.histogram("chat_completion_seconds")
+    requests = metrics.counter_value("requests_total")
+    return {
+        "papers": len(jobs),
+        "wall_seconds": wall,
+        "papers_per_hour": len(jobs) / wall * 3600 if wall > 0 else 0.0,
+        "requests": requests,
+        "requests_per_second": requests / wall if wall > 0 else 0.0,
+        "failed_requests": metrics.counter_value("requests_total", outcome="error"),
+        "retries": metrics.counter_value("retries_total"),
+        "failed_paragraphs": metrics.counter_value("paragraphs_total", source="failed"),
+        "prompt_tokens": metrics.counter_value("prompt_tokens_total"),
+        "completion_tokens": metrics.counter_value("completion_tokens_total"),
+        "request_p50": latency.quantile(0.5) if latency else 0.0,
+        "request_p95": latency.quantile(0.95) if latency else 0.0,
+        "request_p99": latency.quantile(0.99) if latency else 0.0,
+        "completion_p95": completion.quantile(0.95) if completion else 0.0,
+        "completion_p99": completion.quantile(0.99) if completion else 0.0
+    }
+
+
+def scenario_settings(args, paper_names):
+    """影响结果的设置，与基线的设置不同时不比较"""
+    return {
+        "papers": paper_names,
+        "sections": args.sections,
+        "paragraphs": args.paragraphs,
+        "latency_median": args.latency_median,
+        "latency_sigma": args.latency_sigma,
+        "tokens_per_second": args.tokens_per_second,
+        "rate_limit_ratio": args.rate_limit_ratio,
+        "truncate_ratio": args.truncate_ratio,
+        "max_tokens": args.max_tokens,
+        "pack": args.pack,
+        "stream": not args.no_stream
+    }
+
+
+def print_results(results):
+    print(f"{'并发':>4} {'论文/小时':>10} {'请求/秒':>8} {'请求数':>6} {'失败':>4} {'重试':>4} "
+          f"{'输入token':>10} {'输出token':>10} {'p50':>6} {'p95':>6} {'p99':>6} {'完整p95':>8} {'完整p99':>8}")
+    for parallel, result in sorted(results.items(), key=lambda item: int(item[0])):
+        print(f"{parallel:>4} {result['papers_per_hour']:>10.1f} {result['requests_per_second']:>8.2f} "
+              f"{result['requests']:>6} {result['failed_requests']:>4} {result['retries']:>4} "
+              f"{result['prompt_tokens']:>10} {result['completion_tokens']:>10} "
+              f"{result['request_p50']:>6.2f} {result['request_p95']:>6.2f} {result['request_p99']:>6.2f} "
+              f"{result['completion_p95']:>8.2f} {result['completion_p99']:>8.2f}")
+
+
+def compare_with_baseline(results, settings, baseline, tolerance):
+    """与基线比较，返回回退项的说明列表"""
+    if baseline.get("settings") != settings:
+        print("基线的测试设置与本次不同，跳过比较")
+        return []
+    regressions = []
+    print(f"\n与基线比较（容差 {tolerance:.0%}）:")
+    for parallel, result in sorted(results.items(), key=lambda item: int(item[0])):
+        base = baseline.get("results", {}).get(parallel)
+        if base is None:
+            continue
+        throughput = result["papers_per_hour"] / base["papers_per_hour"] - 1 if base["papers_per_hour"] else 0.0
+        tail = result["completion_p95"] / base["completion_p95"] - 1 if base["completion_p95"] else 0.0
+        print(f"并发 {parallel}: 吞吐 {throughput:+.1%}，完整请求p95 {tail:+.1%}，"
+              f"输入token {result['prompt_tokens'] - base['prompt_tokens']:+d}")
+        if throughput < -tolerance:
+            regressions.append(f"并发 {parallel} 吞吐下降 {-throughput:.1%}")
+        if tail > tolerance:
+            regressions.append(f"并发 {parallel} 完整请求p95上升 {tail:.1%}")
+        if result["failed_paragraphs"] > base.get("failed_paragraphs", 0):
+            regressions.append(f"并发 {parallel} 失败段落数从 {base.get('failed_paragraphs', 0)} 增加到 {result['failed_paragraphs']}")
+    return regressions
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="翻译流程吞吐量基准测试（使用本地模拟服务，不调用真实API）")
+    parser.add_argument("inputs", nargs="*", help="用于测试的markdown论文，不指定时生成合成论文")
+    parser.add_argument("--papers", type=int, default=2, help="合成论文篇数")
+    parser.add_argument("--sections", type=int, default=6, help="每篇合成论文的章节数")
+    parser.add_argument("--paragraphs", type=int, default=6, help="每个章节的段落数")
+    parser.add_argument("--parallel", default="2,4,8", help="逗号分隔的并发数列表")
+    parser.add_argument("--latency-median", type=float, default=0.1, help="模拟服务首个token前等待时间的中位数（秒）")
+    parser.add_argument("--latency-sigma", type=float, default=0.6, help="等待时间对数正态分布的sigma")
+    parser.add_argument("--tokens-per-second", type=float, default=1000.0, help="模拟服务每个请求的输出速度")
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0, help="返回429的请求比例")
+    parser.add_argument("--truncate-ratio", type=float, default=0.0, help="回复在结束前断开的请求比例")
+    parser.add_argument("--max-tokens", type=int, default=1024, help="最大Token")
+    parser.add_argument("--backoff-base", type=float, default=0.2, help="重试的初始等待时间（秒）")
+    parser.add_argument("--pack", action="store_true", help="将连续的短段落合并为一个请求")
+    parser.add_argument("--no-stream", action="store_true", help="不使用流式响应")
+    parser.add_argument("--seed", type=int, default=0, help="合成论文和模拟服务的随机种子")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="基线结果文件")
+    parser.add_argument("--save-baseline", action="store_true", help="将本次结果保存为基线")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="吞吐下降或尾部耗时上升超过该比例时视为回退")
+    parser.add_argument("--output", default="", help="将本次结果写入JSON文件")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    parallel_values = [int(value) for value in args.parallel.split(",") if value.strip()]
+
+    server = MockChatServer(MockServerConfig(
+        latency_median=args.latency_median,
+        latency_sigma=args.latency_sigma,
+        tokens_per_second=args.tokens_per_second,
+        rate_limit_ratio=args.rate_limit_ratio,
+        truncate_ratio=args.truncate_ratio,
+        seed=args.seed
+    ))
+    original_url = request_engine.PROVIDER_API_URLS[BENCHMARK_PROVIDER]
+    request_engine.PROVIDER_API_URLS[BENCHMARK_PROVIDER] = server.start()
+    work_root = tempfile.mkdtemp(prefix="translator_benchmark_")
+    try:
+        if args.inputs:
+            papers = list(args.inputs)
+        else:
+            papers = write_papers(os.path.join(work_root, "papers"), args.papers, args.sections, args.paragraphs, args.seed)
+        paper_names = [os.path.basename(path) for path in papers]
+
+        results = {}
+        for parallel in parallel_values:
+            server.reset()
+            work_dir = os.path.join(work_root, f"parallel_{parallel}")
+            results[str(parallel)] = run_once(papers, parallel, args, work_dir)
+            stats = server.stats
+            print(f"并发 {parallel}: 用时 {results[str(parallel)]['wall_seconds']:.1f} 秒，模拟服务收到 {stats.requests} 个请求"
+                  f"（429 {stats.rate_limited}，中途断开 {stats.truncated}）", file=sys.stderr)
+    finally:
+        request_engine.PROVIDER_API_URLS[BENCHMARK_PROVIDER] = original_url
+        server.stop()
+        shutil.rmtree(work_root, ignore_errors=True)
+
+    print_results(results)
+    settings = scenario_settings(args, paper_names)
+    report = {"settings": settings, "results": results}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n已保存基线: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("\n没有基线文件，使用--save-baseline保存本次结果作为基线")
+        return 0
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare_with_baseline(results, settings, baseline, args.tolerance)
+    if regressions:
+        print("\n性能回退:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+import os
+import random
+
+_WORDS = (
+    "market equilibrium price demand supply elasticity consumer producer welfare policy tax subsidy "
+    "household firm labor capital wage interest rate inflation growth productivity investment savings "
+    "estimate model regression coefficient sample variance robust effect treatment instrument panel "
+    "significant evidence result theory assumption parameter optimal utility constraint marginal cost"
+).split()
+
+_SECTIONS = ("Introduction", "Related Literature", "Model", "Data", "Empirical Strategy", "Results",
+             "Robustness", "Discussion", "Conclusion")
+
+
+def _sentence(rng):
+    words = [rng.choice(_WORDS) for _ in range(rng.randint(8, 24))]
+    return " ".join(words).capitalize() + "."
+
+
+def _paragraph(rng):
+    return " ".join(_sentence(rng) for _ in range(rng.randint(2, 7)))
+
+
+def generate_paper(seed, sections=6, paragraphs=6):
+    """生成一篇英文论文的markdown文本：标题、摘要、若干章节，夹有公式、图片和表格等免翻译内容"""
+    rng = random.Random(seed)
+    lines = [f"# Synthetic Paper {seed}: {_sentence(rng)[:-1]}", "", "## Abstract", "", _paragraph(rng), ""]
+    for section_index in range(sections):
+        lines.append(f"## {section_index + 1}. {_SECTIONS[section_index % len(_SECTIONS)]}")
+        lines.append("")
+        for paragraph_index in range(paragraphs):
+            lines.append(_paragraph(rng))
+            lines.append("")
+            if paragraph_index == 1:
+                lines.extend(["$$", "y_{it} = \\alpha + \\beta x_{it} + \\varepsilon_{it}", "$$", ""])
+            elif paragraph_index == 3 and section_index % 2 == 0:
+                lines.extend([f"![](images/figure_{section_index + 1}.jpg)", "", f"Figure {section_index + 1}", ""])
+        if section_index == sections // 2:
+            lines.extend(["| Variable | Mean | SD |", "| --- | --- | --- |", "| price | 1.02 | 0.31 |", ""])
+    return "\n".join(lines)
+
+
+def write_papers(directory, count, sections=6, paragraphs=6, seed=0):
+    """在directory中写入count篇合成论文，返回文件路径列表"""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for index in range(count):
+        path = os.path.join(directory, f"synthetic_paper_{index + 1}.md")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(generate_paper(seed + index, sections, paragraphs))
+        paths.append(path)
+    return paths
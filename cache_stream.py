@@ -0,0 +1,82 @@
+import os
+import time
+
+
+class CacheStreamWriter:
+    """流式输出的写入目标：收到的文本追加到章节缓存文件，并按固定间隔通知接收进度
+
+    收到的文本先放在内存中，遇到换行（段落边界）或距上次写入超过flush_interval秒时才写入文件，
+    不会每收到一个token就写一次文件。推理模型的思考过程只计入进度，不写入缓存文件。
+    请求开始（以及每次重试）前调用reset()，把缓存文件截断回请求前的位置；
+    请求结束后调用finish()同样回滚，再由调用方写入整理后的最终译文，
+    因此缓存文件的最终内容与非流式模式一致。
+    """
+
+    def __init__(self, cache_file=None, on_progress=None, progress_interval=0.2, flush_interval=1.0):
+        self.cache_file = cache_file
+        self.on_progress = on_progress  # on_progress(已接收的译文字数, 已接收的思考过程字数)
+        self.progress_interval = progress_interval
+        self.flush_interval = flush_interval
+        self.start_offset = None
+        self.received_chars = 0
+        self.reasoning_chars = 0
+        self._file = None
+        self._buffer = []
+        self._last_progress = 0.0
+        self._last_flush = time.monotonic()
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def reset(self):
+        """丢弃本次请求已接收的内容"""
+        self._buffer = []
+        self._close_file()
+        self.received_chars = 0
+        self.reasoning_chars = 0
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return
+        size = os.path.getsize(self.cache_file)
+        if self.start_offset is None:
+            self.start_offset = size
+        elif size > self.start_offset:
+            with open(self.cache_file, 'r+b') as f:
+                f.truncate(self.start_offset)
+
+    def write(self, text):
+        """追加一段流式文本"""
+        if self.cache_file:
+            self._buffer.append(text)
+            if "\n" in text or time.monotonic() - self._last_flush >= self.flush_interval:
+                self.flush()
+        self.received_chars += len(text)
+        self._report_progress()
+
+    def write_reasoning(self, text):
+        """记录一段思考过程，只更新接收进度"""
+        self.reasoning_chars += len(text)
+        self._report_progress()
+
+    def flush(self):
+        """将缓冲的文本写入缓存文件"""
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+        if self._file is None:
+            self._file = open(self.cache_file, 'a', encoding='utf-8')
+        self._file.write("".join(self._buffer))
+        self._file.flush()
+        self._buffer = []
+
+    def _report_progress(self):
+        now = time.monotonic()
+        if self.on_progress is not None and now - self._last_progress >= self.progress_interval:
+            self._last_progress = now
+            self.on_progress(self.received_chars, self.reasoning_chars)
+
+    def finish(self):
+        """请求结束，回滚流式写入的内容，准备下一次请求"""
+        self.reset()
+        self.start_offset = None
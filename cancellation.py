@@ -0,0 +1,166 @@
+import asyncio
+import threading
+import time
+
+
+class OperationCancelled(Exception):
+    """任务已停止，正在进行的请求被中止"""
+
+
+class CancellationToken:
+    """翻译任务的停止和暂停信号
+
+    cancel、pause、resume可以在任意线程（如界面线程）中调用；事件循环中的请求通过run包装，
+    停止时立即中止正在进行的请求，暂停时wait_if_paused阻塞到继续或停止为止。
+    截止时间按clock()计算，暂停期间不消耗。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.cancelled = False
+        self.paused = False
+        self._loop = None
+        self._cancel_event = None
+        self._resume_event = None
+        self._paused_since = None
+        self._paused_total = 0.0
+
+    def attach(self, loop):
+        """在事件循环中调用一次，创建供协程等待的事件"""
+        with self._lock:
+            self._loop = loop
+            self._cancel_event = asyncio.Event()
+            self._resume_event = asyncio.Event()
+            self._apply()
+
+    def detach(self):
+        with self._lock:
+            self._loop = None
+            self._cancel_event = None
+            self._resume_event = None
+
+    def reset(self):
+        """开始新任务前清除停止和暂停状态"""
+        with self._lock:
+            self.cancelled = False
+            self.paused = False
+            self._paused_since = None
+            self._paused_total = 0.0
+        self._notify()
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+        self._notify()
+
+    def pause(self):
+        with self._lock:
+            self.paused = True
+            if self._paused_since is None:
+                self._paused_since = time.monotonic()
+        self._notify()
+
+    def resume(self):
+        with self._lock:
+            self.paused = False
+            if self._paused_since is not None:
+                self._paused_total += time.monotonic() - self._paused_since
+                self._paused_since = None
+        self._notify()
+
+    def clock(self):
+        """不计暂停时间的单调时钟（秒），暂停期间停走"""
+        with self._lock:
+            now = time.monotonic()
+            paused = self._paused_total
+            if self._paused_since is not None:
+                paused += now - self._paused_since
+        return now - paused
+
+    def _apply(self):
+        # 只在事件循环所在线程中执行
+        if self._cancel_event is None:
+            return
+        if self.cancelled:
+            self._cancel_event.set()
+        else:
+            self._cancel_event.clear()
+        # 停止时也放行暂停中的请求，使其尽快结束
+        if self.paused and not self.cancelled:
+            self._resume_event.clear()
+        else:
+            self._resume_event.set()
+
+    def _notify(self):
+        loop = self._loop
+        if loop is None:
+            return
+        try:
+            loop.call_soon_threadsafe(self._apply)
+        except RuntimeError:
+            # 事件循环已经关闭
+            pass
+
+    async def wait_if_paused(self):
+        """暂停时等待到继续或停止"""
+        if self._resume_event is not None and not self._resume_event.is_set():
+            await self._resume_event.wait()
+
+    async def sleep(self, seconds):
+        """等待指定秒数，停止时提前返回"""
+        if self._cancel_event is None:
+            await asyncio.sleep(seconds)
+            return
+        try:
+            await asyncio.wait_for(self._cancel_event.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def run_until(self, awaitable, deadline):
+        """运行awaitable并返回结果；按clock()超过deadline时取消它并抛出asyncio.TimeoutError，暂停的时间不计入"""
+        task = asyncio.ensure_future(awaitable)
+        try:
+            while True:
+                remaining = deadline - self.clock()
+                if remaining <= 0:
+                    break
+                done, _ = await asyncio.wait({task}, timeout=remaining)
+                if done:
+                    return task.result()
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        task.cancel()
+        try:
+            await task
+        except (asyncio.CancelledError, Exception):
+            pass
+        raise asyncio.TimeoutError()
+
+    async def run(self, awaitable):
+        """运行awaitable并返回结果；停止时取消它并抛出OperationCancelled"""
+        if self.cancelled:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            raise OperationCancelled()
+        if self._cancel_event is None:
+            return await awaitable
+
+        task = asyncio.ensure_future(awaitable)
+        waiter = asyncio.ensure_future(self._cancel_event.wait())
+        try:
+            await asyncio.wait({task, waiter}, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        finally:
+            waiter.cancel()
+        if task.done():
+            return task.result()
+
+        task.cancel()
+        try:
+            await task
+        except (asyncio.CancelledError, Exception):
+            pass
+        raise OperationCancelled()
@@ -0,0 +1,102 @@
+import threading
+
+import httpx
+
+# 安装了h2时启用HTTP/2多路复用，否则退回HTTP/1.1 keep-alive
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# 与原OpenAI客户端的默认超时保持一致
+DEFAULT_TIMEOUT = 600.0
+# 建立连接的默认超时（秒）
+DEFAULT_CONNECT_TIMEOUT = 10.0
+
+
+class PoolStats:
+    """单个提供商连接池的命中统计：复用已有连接为命中，新建连接为未命中"""
+
+    def __init__(self):
+        self.requests = 0
+        self.new_connections = 0
+
+    @property
+    def hits(self):
+        return max(0, self.requests - self.new_connections)
+
+    @property
+    def misses(self):
+        return self.new_connections
+
+    @property
+    def hit_rate(self):
+        return self.hits / self.requests if self.requests else 0.0
+
+    def as_dict(self):
+        return {
+            "requests": self.requests,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate
+        }
+
+
+class ClientPool:
+    """按API提供商复用的HTTP客户端，同一提供商的所有请求共享连接池"""
+
+    def __init__(self, max_connections=100, max_keepalive_connections=20, keepalive_expiry=30.0, http2=True,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=DEFAULT_TIMEOUT):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        # 读取超时为两次收到数据之间的最长间隔，半开的连接最多阻塞这么久；写入和等待空闲连接同样适用；0表示不限制
+        self.timeout = httpx.Timeout(read_timeout or None, connect=connect_timeout or None)
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self._clients = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def get_client(self, provider):
+        """获取提供商对应的客户端，不存在时创建"""
+        with self._lock:
+            client = self._clients.get(provider)
+            if client is None:
+                stats = self._stats.setdefault(provider, PoolStats())
+                client = httpx.AsyncClient(
+                    limits=self.limits,
+                    http2=self.http2,
+                    timeout=self.timeout,
+                    event_hooks={"request": [self._make_request_hook(stats)]}
+                )
+                self._clients[provider] = client
+            return client
+
+    @staticmethod
+    def _make_request_hook(stats):
+        """通过httpcore的trace扩展统计新建的TCP连接数"""
+        async def trace(event_name, info):
+            if event_name == "connection.connect_tcp.complete":
+                stats.new_connections += 1
+
+        async def on_request(request):
+            stats.requests += 1
+            request.extensions["trace"] = trace
+
+        return on_request
+
+    def stats(self):
+        """返回各提供商的连接池命中统计"""
+        with self._lock:
+            return {provider: stats.as_dict() for provider, stats in self._stats.items()}
+
+    async def aclose(self):
+        """关闭所有客户端，释放连接"""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            await client.aclose()
@@ -0,0 +1,39 @@
+import itertools
+
+import pytest
+
+import request_engine
+from benchmarks.mock_server import MockChatServer, MockServerConfig
+from log_pipeline import ERROR
+from request_engine import RequestEngine
+from translator_engine import EngineListener, TranslationConfig, TranslationEngine
+
+PROVIDER = "Deepseek"
+MODEL = "deepseek-chat"
+# 限流器按提供商和API Key全局共享，每个引擎使用不同的Key，测试之间互不影响
+_api_keys = (f"test-{index}" for index in itertools.count())
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """本地模拟服务，PROVIDER的接口地址指向它"""
+    server = MockChatServer(MockServerConfig(latency_median=0.01, latency_sigma=0.01, tokens_per_second=100000))
+    monkeypatch.setitem(request_engine.PROVIDER_API_URLS, PROVIDER, server.start())
+    yield server
+    server.stop()
+
+
+def make_config(**kwargs):
+    kwargs.setdefault("api_key", next(_api_keys))
+    return TranslationConfig(api_provider=PROVIDER, model=MODEL, backoff_base=0.01, **kwargs)
+
+
+def make_request_engine(**kwargs):
+    kwargs.setdefault("parallel_count", 1)
+    return RequestEngine(make_config(**kwargs), log=lambda *args: None)
+
+
+def make_translation_engine(tmp_path, **kwargs):
+    kwargs.setdefault("use_translation_memory", False)
+    config = make_config(result_path=str(tmp_path / "result"), cache_path=str(tmp_path / "cache"), **kwargs)
+    return TranslationEngine(config, EngineListener(ERROR))
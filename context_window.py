@@ -0,0 +1,73 @@
+from token_utils import estimate_message_tokens, estimate_tokens
+
+# 各模型默认的上下文窗口：(保留的最近对话轮数, 历史对话的token上限)
+# 推理模型输出慢、单价高，窗口取小一些
+MODEL_CONTEXT_WINDOWS = {
+    "deepseek-reasoner": (2, 2000),
+    "deepseek-ai/DeepSeek-R1": (2, 2000),
+    "Pro/deepseek-ai/DeepSeek-R1": (2, 2000),
+    "Qwen/QwQ-32B": (2, 2000),
+}
+DEFAULT_CONTEXT_WINDOW = (4, 4000)
+
+
+def get_context_window_size(model, max_turns=0, max_tokens=0):
+    """返回模型的(对话轮数, token上限)，参数大于0时覆盖模型默认值"""
+    default_turns, default_tokens = MODEL_CONTEXT_WINDOWS.get(model, DEFAULT_CONTEXT_WINDOW)
+    return (max_turns if max_turns > 0 else default_turns,
+            max_tokens if max_tokens > 0 else default_tokens)
+
+
+class ContextWindow:
+    """滑动窗口对话上下文：始终保留开头的指令消息，历史对话只保留最近max_turns轮且不超过max_tokens
+
+    超出窗口时一次裁掉约一半的历史，而不是每轮都移走最早的一轮，使相邻请求的
+    消息前缀保持一致，以命中服务端的前缀缓存（如DeepSeek的上下文硬盘缓存）。
+    同时统计与发送完整历史相比节省的输入token数。
+    """
+
+    def __init__(self, max_turns, max_tokens):
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self.head = []  # 指令等固定消息
+        self.turns = []  # 窗口内的(用户消息, 助手消息)
+        self.full_history_tokens = 0  # 不裁剪时历史对话的token数
+        self.tokens_sent = 0
+        self.tokens_saved = 0
+
+    def add_head(self, message):
+        """添加始终保留的消息（如翻译指令）"""
+        self.head.append(message)
+
+    def add_turn(self, user_content, assistant_content):
+        """记录一轮完成的对话，并裁剪到窗口大小"""
+        turn = ({"role": "user", "content": user_content},
+                {"role": "assistant", "content": assistant_content})
+        self.turns.append(turn)
+        self.full_history_tokens += estimate_message_tokens(turn)
+
+        if self.max_turns <= 0:
+            self.turns = []
+            return
+        if len(self.turns) > self.max_turns:
+            keep_turns = max(1, self.max_turns // 2)
+            self.turns = self.turns[-keep_turns:]
+        if self._window_tokens() > self.max_tokens:
+            while self.turns and self._window_tokens() > self.max_tokens // 2:
+                self.turns.pop(0)
+
+    def _window_tokens(self):
+        return sum(estimate_message_tokens(turn) for turn in self.turns)
+
+    def build(self, user_content):
+        """生成本次请求要发送的消息列表，并累计节省的token数"""
+        messages = list(self.head)
+        for turn in self.turns:
+            messages.extend(turn)
+        messages.append({"role": "user", "content": user_content})
+
+        head_tokens = estimate_message_tokens(self.head) + estimate_tokens(user_content)
+        window_tokens = self._window_tokens()
+        self.tokens_sent += head_tokens + window_tokens
+        self.tokens_saved += self.full_history_tokens - window_tokens
+        return messages
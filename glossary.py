@@ -0,0 +1,46 @@
+import re
+
+GLOSSARY_HEADER = "术语表（译文中请统一使用以下译法）："
+
+
+def load_glossary(path):
+    """读取术语表文件，每行一个术语，原文与译文以制表符或“=”分隔，#开头的行为注释
+
+    返回[(原文, 译文)]，按文件中的顺序，重复的原文以最后一次为准。
+    """
+    entries = {}
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            separator = '\t' if '\t' in line else '='
+            if separator not in line:
+                continue
+            term, translation = (part.strip() for part in line.split(separator, 1))
+            if term and translation:
+                entries.pop(term, None)
+                entries[term] = translation
+    return list(entries.items())
+
+
+def format_glossary(entries):
+    """生成术语表提示词，没有术语时返回空字符串"""
+    if not entries:
+        return ""
+    lines = [GLOSSARY_HEADER]
+    lines.extend(f"{term}：{translation}" for term, translation in entries)
+    return "\n".join(lines)
+
+
+def filter_glossary(entries, texts):
+    """只保留在原文中出现过的术语（英文按整词、不区分大小写匹配）"""
+    if not entries:
+        return []
+    content = "\n".join(texts)
+    selected = []
+    for term, translation in entries:
+        pattern = r'(?<![A-Za-z])' + re.escape(term) + r'(?![A-Za-z])'
+        if re.search(pattern, content, re.I):
+            selected.append((term, translation))
+    return selected
@@ -0,0 +1,69 @@
+import collections
+import math
+
+
+class LatencyTracker:
+    """按(提供商, 模型)记录最近若干次成功请求的耗时，用于计算滚动分位数"""
+
+    def __init__(self, window=200):
+        self.window = window
+        self._samples = {}
+
+    def record(self, key, seconds):
+        samples = self._samples.get(key)
+        if samples is None:
+            samples = self._samples[key] = collections.deque(maxlen=self.window)
+        samples.append(seconds)
+
+    def count(self, key):
+        return len(self._samples.get(key, ()))
+
+    def percentile(self, key, percent):
+        """返回最近耗时的分位数，没有样本时返回None"""
+        samples = self._samples.get(key)
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, max(0, math.ceil(percent / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+
+class HedgePolicy:
+    """对冲请求策略：请求耗时超过滚动分位数时再发一个相同的请求，取先完成的结果
+
+    对冲请求数不超过总请求数的max_ratio；样本数不足min_samples时不对冲，
+    阈值不低于min_delay秒，避免对本来就很快的请求加倍发送。
+    """
+
+    def __init__(self, percent=95.0, min_delay=2.0, max_ratio=0.1, min_samples=20, tracker=None):
+        self.percent = percent
+        self.min_delay = min_delay
+        self.max_ratio = max_ratio
+        self.min_samples = min_samples
+        self.tracker = tracker or LatencyTracker()
+        self.requests = 0
+        self.hedged = 0
+        self.wins = 0  # 对冲请求先完成的次数
+        self.budget_denied = 0  # 超过阈值但因预算用完未对冲的次数
+
+    def threshold(self, key):
+        """返回发起对冲前等待的秒数，样本不足时返回None"""
+        if self.tracker.count(key) < self.min_samples:
+            return None
+        return max(self.min_delay, self.tracker.percentile(key, self.percent))
+
+    def try_acquire(self):
+        """预算内时占用一次对冲名额"""
+        if self.hedged + 1 > self.requests * self.max_ratio:
+            self.budget_denied += 1
+            return False
+        self.hedged += 1
+        return True
+
+    @property
+    def hedge_rate(self):
+        return self.hedged / self.requests if self.requests else 0.0
+
+    @property
+    def win_rate(self):
+        return self.wins / self.hedged if self.hedged else 0.0
@@ -0,0 +1,102 @@
+import hashlib
+import json
+import os
+import threading
+
+from background_writer import BackgroundWriter
+
+
+def make_job_id(source_hash, model, prompt, temperature, source_path=""):
+    """根据原文内容、文件路径和翻译设置生成稳定的任务ID，相同输入重新运行时ID不变
+
+    包含文件的绝对路径，内容相同的两个文件同时翻译时不会共用缓存文件和任务日志。
+    """
+    if source_path:
+        source_path = os.path.normcase(os.path.abspath(source_path))
+    content = json.dumps([source_hash, model, prompt, float(temperature), source_path], ensure_ascii=False)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()[:16]
+
+
+def paragraph_id(chapter_index, paragraph_number):
+    """段落在任务内的稳定ID"""
+    return f"{chapter_index}-{paragraph_number}"
+
+
+class JobJournal:
+    """单个文件翻译任务的日志：每完成一段追加一行JSON并落盘
+
+    进程崩溃、手动停止或断网后重新翻译同一文件时，已完成的段落直接从日志恢复，
+    只翻译缺失的段落。崩溃时写到一半的最后一行在加载时丢弃。
+    写入和fsync在后台线程中进行，积压的多条记录合并后只fsync一次，不阻塞事件循环。
+    """
+
+    def __init__(self, journal_dir, job_id, batch_size=200):
+        self.job_id = job_id
+        self.path = os.path.join(journal_dir, f"journal_{job_id}.jsonl")
+        self.entries = {}
+        self._lock = threading.Lock()
+        os.makedirs(journal_dir, exist_ok=True)
+        self._load()
+        self.resumed_paragraphs = len(self.entries)
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._writer = BackgroundWriter(self._write_batch, "job-journal", "写入任务日志出错", batch_size)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb+') as f:
+            data = f.read()
+            end = data.rfind(b'\n') + 1
+            if end < len(data):
+                # 丢弃崩溃时写了一半的最后一行，避免后续追加的记录与其粘连
+                f.truncate(end)
+        for line in data[:end].decode('utf-8', errors='replace').splitlines():
+            try:
+                entry = json.loads(line)
+                self.entries[entry["id"]] = entry
+            except (ValueError, KeyError):
+                continue
+
+    def get(self, chapter_index, paragraph_number, source):
+        """返回已完成段落的译文，原文不一致或未完成时返回None"""
+        entry = self.entries.get(paragraph_id(chapter_index, paragraph_number))
+        if entry is None or entry["source"] != source:
+            return None
+        return entry["translation"]
+
+    def record(self, chapter_index, paragraph_number, source, translation, model=None):
+        """记录一段已完成的译文及给出译文的模型，由后台线程写入磁盘"""
+        entry = {
+            "id": paragraph_id(chapter_index, paragraph_number),
+            "source": source,
+            "translation": translation,
+            "model": model
+        }
+        with self._lock:
+            existing = self.entries.get(entry["id"])
+            if self._file.closed or (existing is not None and existing["source"] == source
+                                     and existing["translation"] == translation):
+                return
+            self.entries[entry["id"]] = entry
+        self._writer.put(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def _write_batch(self, lines):
+        # 积压的记录合并写入后只fsync一次
+        self._file.write("".join(lines))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        """写完已记录的段落后关闭文件"""
+        with self._lock:
+            if self._file.closed:
+                return
+        self._writer.close()
+        with self._lock:
+            self._file.close()
+
+    def discard(self):
+        """任务完成并合并结果后删除日志"""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,68 @@
+import collections
+import json
+import os
+import threading
+from datetime import datetime
+
+from background_writer import BackgroundWriter
+
+# 日志级别：DEBUG为段落原文和译文等详细内容，界面默认不显示
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+
+
+class LogRingBuffer:
+    """固定容量的日志缓冲区，翻译线程写入、界面线程定期取出，写满时丢弃最旧的日志"""
+
+    def __init__(self, capacity=500):
+        self._items = collections.deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._dropped = 0
+
+    def append(self, item):
+        with self._lock:
+            if len(self._items) == self._items.maxlen:
+                self._dropped += 1
+            self._items.append(item)
+
+    def drain(self):
+        """取出全部日志，返回(日志列表, 自上次取出后丢弃的条数)"""
+        with self._lock:
+            items = list(self._items)
+            self._items.clear()
+            dropped, self._dropped = self._dropped, 0
+        return items, dropped
+
+
+class JsonlLogSink:
+    """在后台线程中将日志逐行以JSON格式写入文件，写入方不等待磁盘IO"""
+
+    def __init__(self, path, batch_size=200):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+        # 文件由写入线程在写完最后一批后关闭，close()等待超时返回时线程仍可继续写入
+        self._writer = BackgroundWriter(self._write_batch, "jsonl-log-sink", "写入日志文件出错", batch_size,
+                                        on_exit=self._file.close)
+
+    def write(self, level, message):
+        self._writer.put({
+            "time": datetime.now().isoformat(timespec="milliseconds"),
+            "level": LEVEL_NAMES.get(level, str(level)),
+            "message": message
+        })
+
+    def _write_batch(self, records):
+        # 积压的日志合并写入后再刷新
+        for record in records:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self, timeout=5):
+        """通知写入线程写完已提交的日志后关闭文件，最多等待timeout秒"""
+        self._writer.close(timeout)
@@ -0,0 +1,209 @@
+import re
+
+# 块类型
+HEADING = "heading"
+PARAGRAPH = "paragraph"
+LIST = "list"
+TABLE = "table"
+MATH = "math"
+CODE = "code"
+IMAGE = "image"
+HTML = "html"
+
+# 需要发送给模型翻译的块类型，其余类型原样保留
+TRANSLATABLE_KINDS = (PARAGRAPH, LIST, TABLE)
+
+# 各类型的中文名称，用于日志
+KIND_NAMES = {
+    HEADING: "标题",
+    PARAGRAPH: "段落",
+    LIST: "列表",
+    TABLE: "表格",
+    MATH: "公式",
+    CODE: "代码",
+    IMAGE: "图片",
+    HTML: "HTML"
+}
+
+_FENCE_PATTERN = re.compile(r'^(`{3,}|~{3,})')
+_IMAGE_PATTERN = re.compile(r'^!\[[^\]]*\]\([^)]*\)$')
+_LIST_PATTERN = re.compile(r'^([-*+]|\d{1,9}[.)])\s+\S')
+_HTML_PATTERN = re.compile(r'^<(!--|/?[A-Za-z][A-Za-z0-9-]*[\s/>]|/?[A-Za-z][A-Za-z0-9-]*$)')
+_HTML_TABLE_PATTERN = re.compile(r'^<table[\s>]', re.I)
+# 未闭合的代码块遇到Markdown标题时结束
+_HEADING_PATTERN = re.compile(r'^#{1,6}\s+\S')
+
+
+class MarkdownBlock:
+    """Markdown文档中的一个块，passthrough_reason不为None时该块原样保留"""
+
+    __slots__ = ("kind", "text", "passthrough_reason")
+
+    def __init__(self, kind, text):
+        self.kind = kind
+        self.text = text
+        self.passthrough_reason = None if kind in TRANSLATABLE_KINDS else KIND_NAMES[kind]
+
+    @property
+    def translatable(self):
+        return self.passthrough_reason is None
+
+    def __repr__(self):
+        return f"MarkdownBlock({self.kind!r}, {self.text[:30]!r})"
+
+
+def _is_math_start(stripped):
+    return stripped.startswith("$$") or stripped.startswith("\\[")
+
+
+def _math_closer(opener):
+    return "$$" if opener == "$$" else "\\]"
+
+
+def _is_math_end(stripped, opener):
+    return _math_closer(opener) in stripped
+
+
+def iter_blocks(lines, max_block_chars=4000):
+    """逐行读取Markdown并依次产出MarkdownBlock，只缓存当前块的行，内存占用与文件大小无关
+
+    lines可以是打开的文件对象或任意行迭代器。代码块、公式块内的内容不会被当作标题或段落；
+    没有空行分隔的超长段落按max_block_chars在行边界处切开，避免单个请求过大。
+    缺少结束标记时，公式块在空行处或超过max_block_chars时结束，代码块在下一个前面有空行的标题处结束，
+    避免OCR漏掉一个结束标记就把文件的其余部分全部当作免翻译内容。
+    """
+    kind = None  # 当前正在收集的块类型
+    buffer = []
+    buffer_chars = 0
+    fence = None  # 代码块的围栏标记
+    math_opener = None
+
+    def flush():
+        nonlocal kind, buffer, buffer_chars
+        block = MarkdownBlock(kind, "\n".join(buffer)) if buffer else None
+        kind = None
+        buffer = []
+        buffer_chars = 0
+        return block
+
+    for raw_line in lines:
+        line = raw_line.rstrip("\r\n")
+        stripped = line.strip()
+
+        # 代码块：直到遇到同样的围栏，未闭合时在下一个标题前结束
+        if kind == CODE:
+            # 只认空行之后的标题，代码中紧接代码行的#注释不会结束代码块
+            if _HEADING_PATTERN.match(line) and not buffer[-1].strip():
+                yield flush()
+            else:
+                buffer.append(line)
+                if stripped.startswith(fence) and stripped.strip(fence[0]) == "":
+                    yield flush()
+                continue
+
+        # 公式块：直到遇到结束标记，未闭合时在空行处或过长时结束
+        if kind == MATH:
+            if not stripped:
+                yield flush()
+                continue
+            buffer.append(line)
+            buffer_chars += len(line)
+            if _is_math_end(stripped, math_opener) or buffer_chars > max_block_chars:
+                yield flush()
+            continue
+
+        if not stripped:
+            if kind is not None:
+                yield flush()
+            continue
+
+        fence_match = _FENCE_PATTERN.match(stripped)
+        if fence_match:
+            if kind is not None:
+                yield flush()
+            kind = CODE
+            fence = fence_match.group(1)
+            buffer.append(line)
+            continue
+
+        if _is_math_start(stripped):
+            opener = "$$" if stripped.startswith("$$") else "\\["
+            closer = _math_closer(opener)
+            end = stripped.find(closer, len(opener))
+            # 行内公式后接正文，如 $$ y = 2 $$ where y is output.，整行作为段落翻译
+            if end < 0 or not stripped[end + len(closer):].strip():
+                if kind is not None:
+                    yield flush()
+                math_opener = opener
+                kind = MATH
+                buffer.append(stripped)
+                buffer_chars += len(stripped)
+                # 单行公式，如 $$x=1$$
+                if end >= 0:
+                    yield flush()
+                continue
+
+        if stripped.startswith("#"):
+            if kind is not None:
+                yield flush()
+            yield MarkdownBlock(HEADING, stripped)
+            continue
+
+        if _IMAGE_PATTERN.match(stripped):
+            if kind is not None:
+                yield flush()
+            yield MarkdownBlock(IMAGE, stripped)
+            continue
+
+        if stripped.startswith("|"):
+            if kind not in (None, TABLE):
+                yield flush()
+            kind = TABLE
+            buffer.append(stripped)
+            continue
+
+        if kind is None and _HTML_PATTERN.match(stripped):
+            # 整段HTML直到空行结束，OCR工具输出的<table>表格中含有需要翻译的文字
+            kind = TABLE if _HTML_TABLE_PATTERN.match(stripped) else HTML
+            buffer.append(stripped)
+            buffer_chars += len(stripped)
+            continue
+
+        if kind == TABLE and not buffer[0].startswith("<"):
+            # Markdown表格以非表格行结束
+            yield flush()
+
+        if kind is None:
+            kind = LIST if _LIST_PATTERN.match(stripped) else PARAGRAPH
+
+        # 段落和列表过长时在行边界处切开
+        if kind in (PARAGRAPH, LIST) and buffer and buffer_chars + len(stripped) > max_block_chars:
+            current_kind = kind
+            yield flush()
+            kind = current_kind
+        buffer.append(stripped)
+        buffer_chars += len(stripped)
+
+    if kind is not None:
+        yield flush()
+
+
+def iter_chapters(blocks, cutoff_titles=()):
+    """按标题将块分组为章节，依次产出(标题, 块列表)；遇到cutoff_titles中的标题（不区分大小写）时停止
+
+    第一个标题之前的内容归为标题为None的章节，没有内容时不产出。
+    """
+    title = None
+    chapter_blocks = []
+    for block in blocks:
+        if block.kind != HEADING:
+            chapter_blocks.append(block)
+            continue
+        if block.text.lower() in cutoff_titles:
+            break
+        if title is not None or chapter_blocks:
+            yield title, chapter_blocks
+        title = block.text
+        chapter_blocks = []
+    if title is not None or chapter_blocks:
+        yield title, chapter_blocks
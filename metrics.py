@@ -0,0 +1,181 @@
+import bisect
+import json
+import os
+import threading
+
+# 耗时类直方图的桶上界（秒）
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+# 生成速度直方图的桶上界（token/秒）
+TOKENS_PER_SECOND_BUCKETS = (1, 2, 5, 10, 15, 20, 30, 40, 50, 75, 100, 150, 200, 300, 500)
+
+METRIC_PREFIX = "scholar_translator_"
+
+
+class Histogram:
+    """固定分桶的直方图，分位数按桶内线性插值估算"""
+
+    def __init__(self, buckets=SECONDS_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # 最后一个桶为+Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else 0.0
+
+    def quantile(self, q):
+        """估算分位数，没有样本时返回0"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            if count and cumulative + count >= rank:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.max
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.max
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip([str(bound) for bound in self.buckets] + ["+Inf"], self.counts))
+        }
+
+
+class MetricsRegistry:
+    """按名称和标签（如provider、model）记录计数器和直方图，可导出为JSON或Prometheus文本格式"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets=SECONDS_BUCKETS, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def counter_value(self, name, **labels):
+        """标签匹配的计数器之和，未给出的标签不限"""
+        with self._lock:
+            return sum(value for (metric, key_labels), value in self._counters.items()
+                       if metric == name and _matches(key_labels, labels))
+
+    def histogram(self, name, **labels):
+        """合并标签匹配的直方图，未给出的标签不限，没有数据时返回None"""
+        merged = None
+        with self._lock:
+            for (metric, key_labels), histogram in self._histograms.items():
+                if metric != name or not _matches(key_labels, labels):
+                    continue
+                if merged is None:
+                    merged = Histogram(histogram.buckets)
+                merged.counts = [a + b for a, b in zip(merged.counts, histogram.counts)]
+                merged.count += histogram.count
+                merged.sum += histogram.sum
+                merged.max = max(merged.max, histogram.max)
+        return merged
+
+    def label_values(self, name, *label_names):
+        """指标name出现过的标签组合，按出现顺序去重"""
+        values = []
+        with self._lock:
+            keys = list(self._counters) + list(self._histograms)
+        for metric, key_labels in keys:
+            if metric != name:
+                continue
+            labels = dict(key_labels)
+            value = tuple(labels.get(label) for label in label_names)
+            if value not in values:
+                values.append(value)
+        return values
+
+    def snapshot(self):
+        """返回可序列化为JSON的全部指标"""
+        with self._lock:
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in self._counters.items()]
+            histograms = [dict(histogram.as_dict(), name=name, labels=dict(labels))
+                          for (name, labels), histogram in self._histograms.items()]
+        return {"counters": counters, "histograms": histograms}
+
+    def to_prometheus(self):
+        """生成Prometheus文本格式（供node_exporter的textfile收集器读取）"""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+            typed = set()
+            for (name, labels), value in counters:
+                metric = METRIC_PREFIX + name
+                if metric not in typed:
+                    typed.add(metric)
+                    lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{metric}{_format_labels(labels)} {value}")
+            for (name, labels), histogram in histograms:
+                metric = METRIC_PREFIX + name
+                if metric not in typed:
+                    typed.add(metric)
+                    lines.append(f"# TYPE {metric} histogram")
+                cumulative = 0
+                for bound, count in zip(list(histogram.buckets) + ["+Inf"], histogram.counts):
+                    cumulative += count
+                    lines.append(f"{metric}_bucket{_format_labels(labels + (('le', str(bound)),))} {cumulative}")
+                lines.append(f"{metric}_sum{_format_labels(labels)} {histogram.sum}")
+                lines.append(f"{metric}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        """写入指标文件：扩展名为.prom时使用Prometheus文本格式，否则为JSON；先写临时文件再替换，避免读到一半的文件"""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        if path.endswith(".prom"):
+            content = self.to_prometheus()
+        else:
+            content = json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+        temp_path = path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(temp_path, path)
+
+
+def _matches(key_labels, labels):
+    key_labels = dict(key_labels)
+    return all(key_labels.get(name) == value for name, value in labels.items())
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = []
+    for name, value in labels:
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        escaped.append(f'{name}="{value}"')
+    return "{" + ",".join(escaped) + "}"
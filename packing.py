@@ -0,0 +1,73 @@
+import re
+
+from token_utils import estimate_tokens
+
+# 合并请求中每段前的编号标记，例如 @@3@@
+PACK_MARKER = "@@{}@@"
+_MARKER_PATTERN = re.compile(r'^[ \t]*@@(\d+)@@[ \t]*', re.M)
+
+# 段落的切分位置：优先在换行处，没有换行时在句末标点后的空白处
+_LINE_BREAK_PATTERN = re.compile(r'\n+')
+_SENTENCE_BREAK_PATTERN = re.compile(r'(?<=[.!?;。！？；])\s+')
+
+# 单段请求的格式
+SINGLE_MESSAGE_TEMPLATE = "【翻译】：{}"
+
+# 合并请求的说明
+PACKED_MESSAGE_TEMPLATE = "【翻译】：以下共{}段，每段以@@编号@@开头。请逐段翻译，每段译文前保留对应的@@编号@@标记，不要合并、拆分或遗漏段落。"
+
+
+def pack_paragraphs(paragraphs, token_budget, max_paragraphs=20):
+    """将连续段落按token预算分组，每组合并为一个请求；单段超出预算时单独成组"""
+    units = []
+    current = []
+    current_tokens = 0
+    for paragraph in paragraphs:
+        tokens = estimate_tokens(paragraph)
+        if current and (current_tokens + tokens > token_budget or len(current) >= max_paragraphs):
+            units.append(current)
+            current = []
+            current_tokens = 0
+        current.append(paragraph)
+        current_tokens += tokens
+    if current:
+        units.append(current)
+    return units
+
+
+def build_user_message(paragraphs):
+    """生成一组段落的翻译请求内容，单段时与原来的格式一致"""
+    if len(paragraphs) == 1:
+        return SINGLE_MESSAGE_TEMPLATE.format(paragraphs[0])
+    parts = [PACKED_MESSAGE_TEMPLATE.format(len(paragraphs))]
+    for i, paragraph in enumerate(paragraphs, 1):
+        parts.append(f"{PACK_MARKER.format(i)} {paragraph}")
+    return "\n\n".join(parts)
+
+
+def split_packed_response(response, count):
+    """按编号标记拆分合并请求的回复，编号不完整、乱序或有空段时返回None"""
+    matches = list(_MARKER_PATTERN.finditer(response))
+    if [int(m.group(1)) for m in matches] != list(range(1, count + 1)):
+        return None
+
+    translations = []
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(response)
+        text = response[match.end():end].strip()
+        if not text:
+            return None
+        translations.append(text)
+    return translations
+
+
+def split_paragraph(paragraph):
+    """在最靠近中间的换行或句子边界处将段落切成两半，返回(前半, 后半, 拼接两半译文的分隔符)，无法切分时返回None"""
+    middle = len(paragraph) // 2
+    for pattern, separator in ((_LINE_BREAK_PATTERN, "\n"), (_SENTENCE_BREAK_PATTERN, "")):
+        cuts = [m for m in pattern.finditer(paragraph)
+                if paragraph[:m.start()].strip() and paragraph[m.end():].strip()]
+        if cuts:
+            cut = min(cuts, key=lambda m: abs(m.start() - middle))
+            return paragraph[:cut.start()], paragraph[cut.end():], separator
+    return None
@@ -0,0 +1,73 @@
+import re
+
+from token_utils import count_cjk
+
+# 原样保留的原因
+IMAGE = "图片"
+FORMULA = "公式"
+LINK = "网址/DOI"
+NUMERIC = "数字"
+FIGURE_LABEL = "图表编号"
+CHINESE = "中文"
+
+_IMAGE_PATTERN = re.compile(r'!\[[^\]]*\]\([^)]*\)')
+_INLINE_MATH_PATTERN = re.compile(r'\$\$.+?\$\$|\$[^$]+\$|\\\(.+?\\\)', re.S)
+_LINK_PATTERN = re.compile(
+    r'^(?:(?:doi|url)\s*[:：]?\s*)?(?:https?://\S+|www\.\S+|doi\.org/\S+|10\.\d{4,9}/\S+)$', re.I)
+_FIGURE_LABEL_PATTERN = re.compile(
+    r'^(?:figure|fig\.?|table|tab\.?|chart|panel|exhibit|appendix|equation|eq\.?)\s*'
+    r'[A-Z]?\d+(?:[.\-]\d+)*[a-z]?(?:\s*\([a-z0-9]\))?[.:：]?$', re.I)
+
+# 中文字符占字母类字符的比例达到该值时视为已是中文
+CHINESE_RATIO = 0.5
+
+
+def classify(text):
+    """判断一段文本是否不需要翻译，返回原样保留的原因，需要翻译时返回None
+
+    只看文本本身：纯图片链接、公式、网址和DOI、只有数字和符号的内容（如数字表格行、页码）、
+    单独的图表编号，以及已经是中文的文本。
+    """
+    stripped = text.strip()
+    if not _IMAGE_PATTERN.sub("", stripped).strip():
+        return IMAGE
+
+    cjk_count = count_cjk(stripped)
+    letter_count = _count_letters(stripped)
+    if cjk_count and cjk_count >= (cjk_count + letter_count) * CHINESE_RATIO:
+        return CHINESE
+
+    if not letter_count:
+        return NUMERIC
+
+    # 去掉公式后只剩数字和符号
+    if "$" in stripped or "\\(" in stripped:
+        remainder = _INLINE_MATH_PATTERN.sub("", stripped)
+        if remainder != stripped and not _count_letters(remainder):
+            return FORMULA
+
+    if all(_LINK_PATTERN.match(token) for token in _split_links(stripped)):
+        return LINK
+
+    if _FIGURE_LABEL_PATTERN.match(stripped):
+        return FIGURE_LABEL
+
+    return None
+
+
+def _count_letters(text):
+    """统计中日韩字符以外的字母，包括西里尔字母、希腊字母和带重音符号的拉丁字母"""
+    letters = "".join(ch for ch in text if ch.isalpha())
+    return len(letters) - count_cjk(letters)
+
+
+def _split_links(text):
+    """把“DOI: 10.xxx”这类前缀和链接合并后按空白拆分"""
+    tokens = text.split()
+    merged = []
+    for token in tokens:
+        if merged and merged[-1].lower().rstrip(":：") in ("doi", "url"):
+            merged[-1] = f"{merged[-1]} {token}"
+        else:
+            merged.append(token)
+    return merged
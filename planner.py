@@ -0,0 +1,110 @@
+import heapq
+
+from packing import build_user_message
+from token_utils import estimate_message_tokens, estimate_tokens
+
+# 各模型的价格（元/百万token）：(输入, 输出)，按各平台2025年公布的价格，仅用于估算
+MODEL_PRICES = {
+    ("Deepseek", "deepseek-chat"): (2.0, 8.0),
+    ("Deepseek", "deepseek-reasoner"): (4.0, 16.0),
+    ("硅基流动", "deepseek-ai/DeepSeek-V3"): (2.0, 8.0),
+    ("硅基流动", "Pro/deepseek-ai/DeepSeek-V3"): (2.0, 8.0),
+    ("硅基流动", "deepseek-ai/DeepSeek-R1"): (4.0, 16.0),
+    ("硅基流动", "Pro/deepseek-ai/DeepSeek-R1"): (4.0, 16.0),
+    ("硅基流动", "Qwen/QwQ-32B"): (1.0, 4.0),
+    ("硅基流动", "deepseek-ai/DeepSeek-R1-Distill-Qwen-32B"): (1.26, 1.26),
+    ("硅基流动", "deepseek-ai/DeepSeek-R1-Distill-Qwen-14B"): (0.7, 0.7),
+    ("硅基流动", "deepseek-ai/DeepSeek-R1-Distill-Qwen-7B"): (0.0, 0.0),
+    ("硅基流动", "deepseek-ai/DeepSeek-R1-Distill-Qwen-1.5B"): (0.0, 0.0),
+    ("硅基流动", "deepseek-ai/DeepSeek-V2.5"): (1.33, 1.33),
+    ("硅基流动", "Qwen/Qwen2.5-72B-Instruct"): (4.13, 4.13),
+    ("硅基流动", "Qwen/Qwen2.5-32B-Instruct"): (1.26, 1.26),
+    ("硅基流动", "Qwen/Qwen2.5-14B-Instruct"): (0.7, 0.7),
+    ("硅基流动", "Qwen/Qwen2.5-7B-Instruct"): (0.0, 0.0),
+}
+
+# 英文原文译成中文后token数约为原文的1.4倍（中文一个字约一个token）
+OUTPUT_TOKEN_RATIO = 1.4
+# 推理模型先输出思考过程，同样按输出计费并占用生成时间，粗略按译文的2倍估算
+REASONING_TOKEN_RATIO = 2.0
+# 单次请求的固定耗时（建立连接、排队、首个token）和生成速度
+REQUEST_LATENCY_SECONDS = 2.0
+OUTPUT_TOKENS_PER_SECOND = 30.0
+
+
+def is_reasoning_model(model):
+    return any(name in model for name in ("R1", "QwQ", "reasoner"))
+
+
+def billed_output_tokens(model, translation_tokens):
+    """译文token数加上推理模型的思考过程"""
+    if is_reasoning_model(model):
+        return int(translation_tokens * (1 + REASONING_TOKEN_RATIO))
+    return translation_tokens
+
+
+def estimate_cost(provider, model, input_tokens, translation_tokens):
+    """估算费用（元），没有价格数据时返回None"""
+    prices = MODEL_PRICES.get((provider, model))
+    if prices is None:
+        return None
+    input_price, output_price = prices
+    output_tokens = billed_output_tokens(model, translation_tokens)
+    return (input_tokens * input_price + output_tokens * output_price) / 1000000
+
+
+class PlanEstimate:
+    """试运行的估算结果，可以是单个文件，也可以是整个队列"""
+
+    def __init__(self):
+        self.files = 0
+        self.chapters = 0
+        self.paragraphs = 0
+        self.passthrough_paragraphs = 0
+        self.requests = 0
+        self.input_tokens = 0
+        self.translation_tokens = 0  # 译文的输出token数，不含推理模型的思考过程
+        self.chapter_seconds = []  # 各工作单元依次请求所需的时间
+
+    def merge(self, other):
+        self.files += other.files
+        self.chapters += other.chapters
+        self.paragraphs += other.paragraphs
+        self.passthrough_paragraphs += other.passthrough_paragraphs
+        self.requests += other.requests
+        self.input_tokens += other.input_tokens
+        self.translation_tokens += other.translation_tokens
+        self.chapter_seconds.extend(other.chapter_seconds)
+
+    def simulate_chapter(self, context, units, model, max_tokens):
+        """按实际的请求方式模拟一个工作单元（章节或章节片段）：units为各请求的段落列表，context为其上下文窗口"""
+        seconds = 0.0
+        for unit in units:
+            user_input = build_user_message(unit)
+            input_tokens = estimate_message_tokens(context.build(user_input))
+            translation_tokens = min(int(sum(estimate_tokens(p) for p in unit) * OUTPUT_TOKEN_RATIO), max_tokens)
+
+            self.requests += 1
+            self.input_tokens += input_tokens
+            self.translation_tokens += translation_tokens
+            seconds += REQUEST_LATENCY_SECONDS + billed_output_tokens(model, translation_tokens) / OUTPUT_TOKENS_PER_SECOND
+
+            # 用同样长度的占位文本代替译文，使后续请求的上下文长度与实际一致
+            context.add_turn(user_input, "译" * translation_tokens)
+        self.chapter_seconds.append(seconds)
+
+    def wall_seconds(self, max_concurrency, max_tokens, requests_per_minute=0, tokens_per_minute=0):
+        """估算总耗时：工作单元按耗时从长到短由空闲的worker取走，同时受每分钟请求数和token数限制"""
+        slots = [0.0] * max(1, max_concurrency)
+        for seconds in sorted(self.chapter_seconds, reverse=True):
+            start = heapq.heappop(slots)
+            heapq.heappush(slots, start + seconds)
+        wall = max(slots)
+
+        if requests_per_minute > 0:
+            wall = max(wall, self.requests / requests_per_minute * 60)
+        if tokens_per_minute > 0:
+            # 限流器按输入token加最大输出token预占每分钟token配额
+            total_tokens = self.input_tokens + self.requests * max_tokens
+            wall = max(wall, total_tokens / tokens_per_minute * 60)
+        return wall
@@ -0,0 +1,87 @@
+import threading
+
+
+class ProgressSnapshot:
+    """两次取出之间有变化的进度，同一项只保留最新值"""
+
+    def __init__(self, files, chapters, streams, events):
+        self.files = files  # 文件路径 -> (已完成段落数, 总段落数)
+        self.chapters = chapters  # (文件路径, 章节序号) -> (已完成段落数, 章节段落数)
+        self.streams = streams  # (文件路径, 章节序号) -> (当前请求已接收的译文字数, 思考过程字数)
+        self.events = events  # 合并前的事件数
+
+    def __bool__(self):
+        return bool(self.files or self.chapters or self.streams)
+
+
+class ProgressBus:
+    """线程安全的进度事件汇总
+
+    翻译线程每完成一段或收到一段流式数据时发布事件，只更新对应项的最新值；
+    界面或命令行按固定频率调用take_snapshot取出合并后的变化，开销与事件数无关。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._files = {}
+        self._chapters = {}
+        self._streams = {}
+        self._events = 0
+
+    def publish_paragraph(self, file_path, chapter_index, chapter_completed, chapter_total, completed, total):
+        with self._lock:
+            self._chapters[(file_path, chapter_index)] = (chapter_completed, chapter_total)
+            self._files[file_path] = (completed, total)
+            self._events += 1
+
+    def publish_file(self, file_path, completed, total):
+        with self._lock:
+            self._files[file_path] = (completed, total)
+            self._events += 1
+
+    def publish_stream(self, file_path, chapter_index, received_chars, reasoning_chars=0):
+        with self._lock:
+            self._streams[(file_path, chapter_index)] = (received_chars, reasoning_chars)
+            self._events += 1
+
+    def take_snapshot(self):
+        """取出自上次调用以来的变化"""
+        with self._lock:
+            snapshot = ProgressSnapshot(self._files, self._chapters, self._streams, self._events)
+            self._files = {}
+            self._chapters = {}
+            self._streams = {}
+            self._events = 0
+        return snapshot
+
+
+class ProgressReporter:
+    """后台线程按固定间隔取出进度快照交给callback，用于没有事件循环的命令行"""
+
+    def __init__(self, bus, callback, interval=0.5):
+        self.bus = bus
+        self.callback = callback
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="progress-reporter", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self._report()
+        self._report()
+
+    def _report(self):
+        snapshot = self.bus.take_snapshot()
+        if snapshot:
+            try:
+                self.callback(snapshot)
+            except Exception as e:
+                print(f"输出进度时出错: {str(e)}")
+
+    def stop(self):
+        """停止线程，停止前输出最后一次变化"""
+        self._stop_event.set()
+        self._thread.join(timeout=5)
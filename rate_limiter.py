@@ -0,0 +1,109 @@
+import asyncio
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+
+class TokenBucket:
+    """令牌桶：容量为每分钟配额，按配额/60的速度匀速补充"""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """返回凑够amount个令牌还需等待的秒数"""
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """同一提供商、同一API Key共享的限流器，同时限制每分钟请求数和每分钟token数
+
+    requests_per_minute或tokens_per_minute为0时表示不限制该项。
+    收到429时调用pause()，所有共用该Key的请求一起暂停。
+    """
+
+    def __init__(self, requests_per_minute=0, tokens_per_minute=0):
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _try_acquire(self, tokens):
+        """尝试取得一次请求的配额，成功返回0，否则返回需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            if self.paused_until > now:
+                return self.paused_until - now
+
+            wait = 0.0
+            for bucket, amount in ((self.request_bucket, 1), (self.token_bucket, tokens)):
+                if bucket is not None:
+                    bucket.refill(now)
+                    wait = max(wait, bucket.wait_time(amount))
+            if wait > 0:
+                return wait
+
+            if self.request_bucket is not None:
+                self.request_bucket.tokens -= 1
+            if self.token_bucket is not None:
+                self.token_bucket.tokens -= min(tokens, self.token_bucket.capacity)
+            return 0.0
+
+    async def acquire(self, tokens=0):
+        """等待直到可以发送一个预计消耗tokens个token的请求"""
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds):
+        """暂停发送请求seconds秒（例如收到429后）"""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider, api_key, requests_per_minute=0, tokens_per_minute=0):
+    """获取（不存在时创建）指定提供商和API Key共享的限流器"""
+    key = (provider, api_key, requests_per_minute, tokens_per_minute)
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+            _limiters[key] = limiter
+        return limiter
+
+
+def parse_retry_after(value):
+    """解析Retry-After响应头（秒数或HTTP日期），无法解析时返回None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_time = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_time.timestamp() - time.time())
+
+
+def backoff_delay(attempt, base=1.0, max_delay=60.0):
+    """带随机抖动的指数退避（full jitter），attempt从0开始"""
+    return random.uniform(0, min(max_delay, base * (2 ** attempt)))
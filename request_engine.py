@@ -0,0 +1,448 @@
+import asyncio
+import json
+import time
+
+import httpx
+
+from cancellation import CancellationToken, OperationCancelled
+from client_pool import ClientPool
+from hedging import HedgePolicy
+from metrics import TOKENS_PER_SECOND_BUCKETS, MetricsRegistry
+from rate_limiter import backoff_delay, get_rate_limiter, parse_retry_after
+from router import Route, Router, parse_route
+from token_utils import estimate_message_tokens, estimate_tokens
+
+# 各API提供商的接口地址（均兼容OpenAI的chat/completions接口）
+PROVIDER_API_URLS = {
+    "硅基流动": "https://api.siliconflow.cn/v1/chat/completions",
+    "Deepseek": "https://api.deepseek.com/chat/completions"
+}
+
+# 各API提供商额外的请求参数
+PROVIDER_EXTRA_PAYLOAD = {
+    "硅基流动": {"response_format": {"type": "text"}},
+    "Deepseek": {}
+}
+
+
+class StreamError(Exception):
+    """流式响应超过空闲时间没有新数据，或在结束标记前断开"""
+
+
+class Reply(str):
+    """模型回复的文本，model为实际给出该回复的线路的模型（有备用线路或对冲请求时可能不是主线路的模型）"""
+
+    def __new__(cls, text, model):
+        reply = super().__new__(cls, text)
+        reply.model = model
+        return reply
+
+
+class ReplyTruncated(Exception):
+    """回复达到max_tokens上限被截断（finish_reason为length），重试相同的请求同样会被截断，由调用方拆小后重新请求"""
+
+    def __init__(self, content):
+        super().__init__("回复达到max_tokens上限被截断")
+        self.content = content
+
+
+class UsageStats:
+    """按服务端返回的usage累计token用量，区分命中前缀缓存的输入token
+
+    DeepSeek返回prompt_cache_hit_tokens/prompt_cache_miss_tokens，
+    其他兼容OpenAI的接口返回prompt_tokens_details.cached_tokens。
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cache_hit_tokens = 0
+
+    def record(self, usage):
+        if not usage:
+            return
+        prompt_tokens = int(usage.get("prompt_tokens") or 0)
+        cached = usage.get("prompt_cache_hit_tokens")
+        if cached is None:
+            cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+        self.requests += 1
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += int(usage.get("completion_tokens") or 0)
+        self.cache_hit_tokens += min(int(cached or 0), prompt_tokens)
+
+    @property
+    def cache_miss_tokens(self):
+        return self.prompt_tokens - self.cache_hit_tokens
+
+    @property
+    def cache_hit_rate(self):
+        return self.cache_hit_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+
+    def as_dict(self):
+        return {
+            "requests": self.requests,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cache_hit_tokens": self.cache_hit_tokens,
+            "cache_miss_tokens": self.cache_miss_tokens,
+            "cache_hit_rate": self.cache_hit_rate
+        }
+
+
+class RequestEngine:
+    """基于asyncio的请求层，整个翻译任务共享一个并发上限
+
+    所有文件、所有章节的请求都经过同一个信号量，最多同时有max_concurrency个请求在途。
+    等待网络返回时不占用线程，因此并发数可以远大于线程池的大小。
+    配置了多条线路时，每次请求由路由层选择提供商和模型，出错时自动转到其他线路。
+    """
+
+    def __init__(self, config, log=print, metrics=None, cancel_token=None):
+        self.config = config
+        self.log = log
+        self.metrics = metrics if metrics is not None else MetricsRegistry()
+        self.cancel_token = cancel_token if cancel_token is not None else CancellationToken()
+        self.max_concurrency = max(1, int(config.parallel_count))
+        self._semaphore = None
+        self.client_pool = ClientPool(
+            max_connections=int(config.pool_max_connections),
+            max_keepalive_connections=int(config.pool_max_keepalive),
+            keepalive_expiry=float(config.pool_keepalive_expiry),
+            http2=config.http2,
+            connect_timeout=float(config.connect_timeout),
+            read_timeout=float(config.read_timeout)
+        )
+        self.usage = UsageStats()
+        self.hedge_policy = None
+        if config.hedge_requests:
+            self.hedge_policy = HedgePolicy(
+                percent=float(config.hedge_percentile),
+                min_delay=float(config.hedge_min_delay),
+                max_ratio=float(config.hedge_max_ratio)
+            )
+        self.router = Router(self._build_routes())
+
+    def _build_routes(self):
+        """主线路来自api_provider、model和api_key，extra_routes中的“提供商:模型[:API Key]”为备用线路"""
+        specs = [(self.config.api_provider, self.config.model, self.config.api_key)]
+        for spec in self.config.extra_routes:
+            try:
+                specs.append(parse_route(spec, self.config.api_key))
+            except ValueError as e:
+                self.log(str(e))
+        routes = []
+        for provider, model, api_key in specs:
+            if provider not in PROVIDER_API_URLS:
+                self.log(f"未知的API提供商: {provider}")
+                continue
+            # 每分钟请求数和token数的限制按提供商和API Key分别计算
+            rate_limiter = get_rate_limiter(
+                provider,
+                api_key,
+                requests_per_minute=int(self.config.requests_per_minute),
+                tokens_per_minute=int(self.config.tokens_per_minute)
+            )
+            routes.append(Route(provider, model, api_key, rate_limiter))
+        return routes
+
+    @property
+    def semaphore(self):
+        # 信号量必须在事件循环中创建
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def build_payload(self, messages, route):
+        """组装请求体"""
+        payload = {
+            "model": route.model,
+            "messages": messages,
+            "temperature": float(self.config.temperature),
+            "max_tokens": int(self.config.max_tokens)
+        }
+        payload.update(PROVIDER_EXTRA_PAYLOAD.get(route.provider, {}))
+        return payload
+
+    async def _post(self, route, messages, stream_sink=None):
+        """通过指定线路发送一次请求，返回(模型回复, 服务端返回的usage, finish_reason)"""
+        payload = self.build_payload(messages, route)
+        headers = {
+            "Authorization": f"Bearer {route.api_key}",
+            "Content-Type": "application/json"
+        }
+        api_url = PROVIDER_API_URLS[route.provider]
+        client = self.client_pool.get_client(route.provider)
+        if self.config.stream:
+            return await self._post_stream(client, api_url, payload, headers, stream_sink)
+        response = await client.post(api_url, json=payload, headers=headers)
+        response.raise_for_status()
+        data = response.json()
+        choice = data['choices'][0]
+        return choice['message']['content'], data.get('usage'), choice.get('finish_reason')
+
+    async def _post_stream(self, client, api_url, payload, headers, stream_sink):
+        """以流式方式请求，收到的译文和思考过程实时交给stream_sink，两段数据的间隔超过stream_idle_timeout时中止"""
+        # 0表示不限制
+        idle_timeout = float(self.config.stream_idle_timeout) or None
+        parts = []
+        finished = False
+        finish_reason = None
+        usage = None
+        # 要求在最后一个数据块中返回本次请求的token用量
+        stream_payload = dict(payload, stream=True, stream_options={"include_usage": True})
+        async with client.stream("POST", api_url, json=stream_payload, headers=headers) as response:
+            if response.status_code >= 400:
+                await response.aread()
+                response.raise_for_status()
+
+            lines = response.aiter_lines()
+            while True:
+                try:
+                    line = await asyncio.wait_for(lines.__anext__(), idle_timeout)
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    raise StreamError(f"流式响应超过 {idle_timeout:.0f} 秒没有新数据")
+
+                line = line.strip()
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    # 继续读到响应结束，连接才能放回连接池复用
+                    finished = True
+                    continue
+
+                chunk = json.loads(data)
+                if chunk.get("usage"):
+                    usage = chunk["usage"]
+                for choice in chunk.get("choices") or []:
+                    delta = choice.get("delta") or {}
+                    # 推理模型的思考过程（reasoning_content）只作为接收进度，不计入译文
+                    reasoning = delta.get("reasoning_content")
+                    if reasoning and stream_sink is not None:
+                        stream_sink.write_reasoning(reasoning)
+                    content = delta.get("content")
+                    if content:
+                        parts.append(content)
+                        if stream_sink is not None:
+                            stream_sink.write(content)
+                    if choice.get("finish_reason"):
+                        finish_reason = choice["finish_reason"]
+                        finished = True
+
+        if not finished:
+            raise StreamError("流式响应在结束前断开")
+        return "".join(parts), usage, finish_reason
+
+    async def _timed_post(self, route, messages, stream_sink=None):
+        """发送请求，记录耗时、token用量和生成速度，成功时的耗时同时供路由权重和对冲阈值使用
+
+        返回Reply，记录给出回复的模型；回复因达到max_tokens被截断时抛出ReplyTruncated，截断的回复不作为译文返回。
+        """
+        labels = {"provider": route.provider, "model": route.model}
+        started = time.monotonic()
+        try:
+            result, usage, finish_reason = await self._post(route, messages, stream_sink)
+        except Exception:
+            self.metrics.inc("requests_total", outcome="error", **labels)
+            self.metrics.observe("request_seconds", time.monotonic() - started, outcome="error", **labels)
+            raise
+        seconds = time.monotonic() - started
+        self.router.record_success(route, seconds)
+        if self.hedge_policy is not None:
+            self.hedge_policy.tracker.record((route.provider, route.model), seconds)
+
+        self.usage.record(usage)
+        usage = usage or {}
+        # 服务端没有返回用量时按译文估算输出token数
+        completion_tokens = int(usage.get("completion_tokens") or 0) or estimate_tokens(result)
+        self.metrics.inc("requests_total", outcome="ok", **labels)
+        self.metrics.observe("request_seconds", seconds, outcome="ok", **labels)
+        self.metrics.inc("prompt_tokens_total", int(usage.get("prompt_tokens") or 0), **labels)
+        self.metrics.inc("completion_tokens_total", completion_tokens, **labels)
+        if seconds > 0:
+            self.metrics.observe("output_tokens_per_second", completion_tokens / seconds,
+                                 buckets=TOKENS_PER_SECOND_BUCKETS, **labels)
+        if finish_reason == "length":
+            self.metrics.inc("truncated_replies_total", **labels)
+            raise ReplyTruncated(result)
+        return Reply(result, route.model)
+
+    async def _hedge_post(self, route, messages, estimated_tokens):
+        """对冲请求：与普通请求一样暂停时不发出、占用一个并发名额并受限流约束；不写入流式输出"""
+        await self.cancel_token.wait_if_paused()
+        async with self.semaphore:
+            await route.rate_limiter.acquire(estimated_tokens)
+            return await self._timed_post(route, messages)
+
+    async def _post_hedged(self, route, messages, estimated_tokens, stream_sink=None):
+        """请求超过滚动分位数耗时仍未完成时，再发一个相同的请求，取先成功的结果并取消另一个
+
+        有多条线路时对冲请求发往另一条线路。暂停时不发起对冲；对冲请求要等到有空闲的并发名额才发出，
+        原请求先完成时直接取消。
+        """
+        policy = self.hedge_policy
+        policy.requests += 1
+        primary = asyncio.ensure_future(self._timed_post(route, messages, stream_sink))
+        tasks = {primary}
+        try:
+            threshold = policy.threshold((route.provider, route.model))
+            if threshold is None:
+                return await primary
+            done, _ = await asyncio.wait(tasks, timeout=threshold)
+            if done or self.cancel_token.paused or not policy.try_acquire():
+                return await primary
+
+            hedge_route = self.router.choose(exclude=route)
+            self.log(f"请求已等待 {threshold:.1f} 秒，向 {hedge_route.name} 发送对冲请求")
+            hedge = asyncio.ensure_future(self._hedge_post(hedge_route, messages, estimated_tokens))
+            tasks.add(hedge)
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            policy.wins += 1
+                        return task.result()
+            # 两个请求都失败时按原请求的错误处理
+            raise primary.exception()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def aclose(self):
+        """关闭连接池"""
+        await self.client_pool.aclose()
+
+    async def chat_completion(self, messages, stream_sink=None, deadline=None):
+        """在全局并发上限和限流配额内调用API，失败时转到其他线路或按指数退避重试，返回Reply，最终失败返回None
+
+        流式模式下收到的文本实时写入stream_sink（需提供write、write_reasoning和reset方法），每次重试前先reset。
+        暂停时不再发出新请求（已发出的请求继续完成），停止时中止正在进行的请求并返回None。
+        给出deadline（按cancel_token.clock()计，暂停期间不消耗）时，包括排队、重试和退避等待在内必须在此之前完成，
+        否则中止并返回None。
+        回复达到max_tokens上限被截断时不重试，抛出ReplyTruncated。
+        """
+        started = time.monotonic()
+        try:
+            if deadline is None:
+                result = await self._chat_completion(messages, stream_sink)
+            elif deadline <= self.cancel_token.clock():
+                self.metrics.inc("chat_completions_total", outcome="deadline")
+                return None
+            else:
+                result = await self.cancel_token.run_until(self._chat_completion(messages, stream_sink, deadline), deadline)
+        except OperationCancelled:
+            self.metrics.inc("chat_completions_total", outcome="cancelled")
+            return None
+        except ReplyTruncated:
+            self.metrics.inc("chat_completions_total", outcome="length")
+            self.metrics.observe("chat_completion_seconds", time.monotonic() - started, outcome="length")
+            raise
+        except asyncio.TimeoutError:
+            self.metrics.inc("chat_completions_total", outcome="deadline")
+            self.metrics.observe("chat_completion_seconds", time.monotonic() - started, outcome="deadline")
+            self.log(f"请求超过截止时间（已等待 {time.monotonic() - started:.0f} 秒），不再重试")
+            return None
+        # 包括排队、重试和退避等待在内的总耗时
+        outcome = "ok" if result is not None else "failed"
+        self.metrics.inc("chat_completions_total", outcome=outcome)
+        self.metrics.observe("chat_completion_seconds", time.monotonic() - started, outcome=outcome)
+        return result
+
+    async def _chat_completion(self, messages, stream_sink=None, deadline=None):
+        if not self.router.routes:
+            self.log("没有可用的API线路")
+            return None
+
+        # 按输入token加上最大输出token预占每分钟token配额
+        estimated_tokens = estimate_message_tokens(messages) + int(self.config.max_tokens)
+        max_retries = int(self.config.max_retries)
+        request_timeout = float(self.config.request_timeout)
+
+        token = self.cancel_token
+        route = None
+        for attempt in range(max_retries + 1):
+            # 暂停期间不发出新请求
+            await token.wait_if_paused()
+            if token.cancelled:
+                raise OperationCancelled()
+            # 重试时避开刚失败的线路
+            route = self.router.choose(exclude=route)
+            labels = {"provider": route.provider, "model": route.model}
+            if attempt:
+                self.metrics.inc("retries_total", **labels)
+            wait_started = time.monotonic()
+            async with self.semaphore:
+                await token.run(route.rate_limiter.acquire(estimated_tokens))
+                # 等待并发名额和限流配额的时间
+                self.metrics.observe("request_wait_seconds", time.monotonic() - wait_started, **labels)
+                if stream_sink is not None:
+                    stream_sink.reset()
+                status_code = None  # 服务端返回错误状态码时记录，网络错误和超时为None
+                try:
+                    if self.hedge_policy is not None:
+                        post = self._post_hedged(route, messages, estimated_tokens, stream_sink)
+                    else:
+                        post = self._timed_post(route, messages, stream_sink)
+                    if request_timeout > 0:
+                        # 单次请求的总超时，防止服务端持续缓慢输出时长期占用并发名额
+                        post = asyncio.wait_for(post, request_timeout)
+                    return await token.run(post)
+                except (OperationCancelled, ReplyTruncated):
+                    raise
+                except asyncio.TimeoutError:
+                    self.metrics.inc("request_errors_total", error="timeout", **labels)
+                    retry_after = None
+                    error = f"请求超过 {request_timeout:.0f} 秒未完成"
+                except httpx.HTTPStatusError as e:
+                    status_code = e.response.status_code
+                    self.metrics.inc("request_errors_total", error=f"http_{status_code}", **labels)
+                    if status_code in (401, 403) and self.router.has_alternative(route):
+                        # API Key无效或无权限，停用该线路，改用其他线路
+                        self.router.disable(route)
+                        self.log(f"{route.name} API请求失败: {str(e)}，停用该线路")
+                        continue
+                    if status_code != 429 and status_code < 500:
+                        # 鉴权失败、参数错误等请求重试也不会成功
+                        self.log(f"{route.name} API请求失败: {str(e)}")
+                        return None
+                    retry_after = parse_retry_after(e.response.headers.get("Retry-After"))
+                    error = f"HTTP {status_code}"
+                except (httpx.TransportError, StreamError) as e:
+                    self.metrics.inc("request_errors_total", error=type(e).__name__, **labels)
+                    retry_after = None
+                    error = f"{type(e).__name__}: {str(e)}"
+                except Exception as e:
+                    self.metrics.inc("request_errors_total", error=type(e).__name__, **labels)
+                    self.log(f"{route.name} API请求失败: {str(e)}")
+                    return None
+
+            self.router.record_failure(route, retry_after)
+            if attempt >= max_retries:
+                self.log(f"{route.name} API请求失败: {error}，已达到最大重试次数")
+                return None
+
+            delay = backoff_delay(attempt, float(self.config.backoff_base), float(self.config.backoff_max))
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+            if status_code == 429:
+                # 速率受限时同一Key的所有请求一起暂停
+                route.rate_limiter.pause(delay)
+            if deadline is not None and token.clock() + delay >= deadline and not self.router.has_alternative(route):
+                # 等到重试时已超过截止时间，不再等待
+                self.log(f"{route.name} API请求失败: {error}，剩余时间不足以等待重试，不再重试")
+                return None
+            if self.router.has_alternative(route):
+                # 有其他可用线路时立即转过去重试，不等待
+                self.router.failovers += 1
+                self.log(f"{route.name} API请求失败: {error}，转到其他线路进行第 {attempt + 1} 次重试...")
+                continue
+            self.log(f"{route.name} API请求失败: {error}，{delay:.1f}秒后进行第 {attempt + 1} 次重试...")
+            # 等待期间释放并发名额，停止时提前结束等待
+            await token.sleep(delay)
+        return None
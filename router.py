@@ -0,0 +1,126 @@
+import random
+import time
+
+# 还没有耗时数据的线路按该耗时（秒）计算权重，保证新线路也能分到请求
+DEFAULT_LATENCY = 10.0
+# 耗时和错误率的指数移动平均系数
+EWMA_ALPHA = 0.2
+
+
+def parse_route(spec, default_api_key=""):
+    """解析“提供商:模型[:API Key]”形式的线路配置，返回(提供商, 模型, API Key)"""
+    parts = spec.split(":", 2)
+    if len(parts) < 2 or not parts[0] or not parts[1]:
+        raise ValueError(f"线路格式应为“提供商:模型[:API Key]”: {spec}")
+    api_key = parts[2] if len(parts) == 3 and parts[2] else default_api_key
+    return parts[0], parts[1], api_key
+
+
+class Route:
+    """一条可用的线路：提供商、模型和API Key，以及观测到的耗时和错误率"""
+
+    def __init__(self, provider, model, api_key, rate_limiter=None):
+        self.provider = provider
+        self.model = model
+        self.api_key = api_key
+        self.rate_limiter = rate_limiter
+        self.requests = 0
+        self.failures = 0
+        self.total_seconds = 0.0
+        self.latency_ewma = None
+        self.error_ewma = 0.0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self.disabled = False  # 鉴权失败等无法恢复的错误
+
+    @property
+    def name(self):
+        return f"{self.provider}/{self.model}"
+
+    def available(self, now):
+        return not self.disabled and now >= self.cooldown_until
+
+    def weight(self, default_latency):
+        latency = self.latency_ewma if self.latency_ewma is not None else default_latency
+        return max(0.01, 1.0 - self.error_ewma) ** 2 / max(latency, 0.01)
+
+
+class Router:
+    """多线路路由：按观测到的耗时和错误率加权随机选择线路，出错的线路暂时冷却，请求自动转到其他线路
+
+    只有一条线路时总是选它，行为与不使用路由相同。
+    """
+
+    def __init__(self, routes, cooldown_base=5.0, cooldown_max=120.0):
+        self.routes = list(routes)
+        self.cooldown_base = cooldown_base
+        self.cooldown_max = cooldown_max
+        self.failovers = 0
+
+    def _default_latency(self):
+        known = [route.latency_ewma for route in self.routes if route.latency_ewma is not None]
+        return sum(known) / len(known) if known else DEFAULT_LATENCY
+
+    def choose(self, exclude=None):
+        """选择一条线路；exclude为刚失败的线路，有其他可用线路时避开它"""
+        now = time.monotonic()
+        candidates = [route for route in self.routes if route.available(now) and route is not exclude]
+        if not candidates:
+            candidates = [route for route in self.routes if route.available(now)]
+        if not candidates:
+            # 全部在冷却中时选最早结束冷却的线路，由调用方按原逻辑退避重试
+            enabled = [route for route in self.routes if not route.disabled] or self.routes
+            return min(enabled, key=lambda route: route.cooldown_until)
+        if len(candidates) == 1:
+            return candidates[0]
+        default_latency = self._default_latency()
+        weights = [route.weight(default_latency) for route in candidates]
+        return random.choices(candidates, weights=weights)[0]
+
+    def has_alternative(self, route):
+        """除route外是否还有可用线路"""
+        now = time.monotonic()
+        return any(other is not route and other.available(now) for other in self.routes)
+
+    def record_success(self, route, seconds):
+        route.requests += 1
+        route.total_seconds += seconds
+        route.latency_ewma = seconds if route.latency_ewma is None else (
+            EWMA_ALPHA * seconds + (1 - EWMA_ALPHA) * route.latency_ewma)
+        route.error_ewma *= 1 - EWMA_ALPHA
+        route.consecutive_failures = 0
+
+    def record_failure(self, route, retry_after=None):
+        """记录一次可重试的失败，线路按连续失败次数冷却一段时间"""
+        route.requests += 1
+        route.failures += 1
+        route.error_ewma = EWMA_ALPHA + (1 - EWMA_ALPHA) * route.error_ewma
+        route.consecutive_failures += 1
+        cooldown = min(self.cooldown_max, self.cooldown_base * 2 ** (route.consecutive_failures - 1))
+        if retry_after is not None:
+            cooldown = max(cooldown, retry_after)
+        if len(self.routes) > 1:
+            route.cooldown_until = time.monotonic() + cooldown
+
+    def disable(self, route):
+        """停用无法恢复的线路（如API Key无效）"""
+        route.requests += 1
+        route.failures += 1
+        route.disabled = True
+
+    def stats(self):
+        """各线路的请求数、失败数、平均耗时和请求占比"""
+        total = sum(route.requests for route in self.routes)
+        result = []
+        for route in self.routes:
+            successes = route.requests - route.failures
+            result.append({
+                "name": route.name,
+                "requests": route.requests,
+                "failures": route.failures,
+                "error_rate": route.failures / route.requests if route.requests else 0.0,
+                "avg_seconds": route.total_seconds / successes if successes else 0.0,
+                "share": route.requests / total if total else 0.0,
+                "disabled": route.disabled
+            })
+        return result
@@ -0,0 +1,152 @@
+import asyncio
+import heapq
+import itertools
+import time
+
+
+class _LoopBound:
+    """持有asyncio.Condition的调度器基类：对象可以在事件循环外构造，条件变量在第一次使用（已在事件循环中）时才创建"""
+
+    def __init__(self):
+        self._condition = None
+
+    @property
+    def condition(self):
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+
+class FilePipeline(_LoopBound):
+    """队列级流水线调度：有空闲请求名额时提前开始下一个文件
+
+    每个未完成的工作单元（章节或章节片段）同一时刻最多占用一个请求名额。未完成单元数少于并发上限时，
+    说明有名额空闲，此时开始解析并翻译队列中的下一个文件；各文件在自己的章节
+    全部完成后独立合并，不等待其他文件。max_active_files限制同时处理的文件数，
+    避免一次性解析整个队列，为0时不限制。
+    """
+
+    def __init__(self, max_slots, max_active_files=0):
+        super().__init__()
+        self.max_slots = max(1, max_slots)
+        self.max_active_files = max_active_files
+        self.active_units = 0
+        self.active_files = 0
+
+    def _has_free_slot(self):
+        if self.max_active_files > 0 and self.active_files >= self.max_active_files:
+            return False
+        return self.active_units < self.max_slots
+
+    async def acquire_file(self):
+        """等待到有空闲名额时占用一个文件位置"""
+        async with self.condition:
+            await self.condition.wait_for(self._has_free_slot)
+            self.active_files += 1
+
+    def add_units(self, count):
+        """登记文件中待翻译的工作单元数"""
+        self.active_units += count
+
+    async def unit_done(self):
+        """一个工作单元完成，释放其占用的名额"""
+        async with self.condition:
+            self.active_units -= 1
+            self.condition.notify_all()
+
+    async def release_file(self):
+        """文件处理结束（完成、失败或停止）"""
+        async with self.condition:
+            self.active_files -= 1
+            self.condition.notify_all()
+
+
+class WorkQueue(_LoopBound):
+    """全局工作队列：所有文件的工作单元（章节或长章节拆出的片段）按预估工作量从大到小排列
+
+    固定数量的worker各自从队列中取出当前最大的单元执行，完成后立即取下一个，
+    最长的单元最先开始，避免最后只剩一个长章节串行翻译而其他worker空闲。
+    同时统计各worker的忙碌和空闲时间，传入metrics时记录每个单元的排队时间和执行时间。
+    """
+
+    def __init__(self, workers, metrics=None):
+        super().__init__()
+        self.workers = max(1, workers)
+        self.metrics = metrics
+        self.busy_seconds = [0.0] * self.workers
+        self.units_done = 0
+        self._heap = []
+        self._sequence = itertools.count()
+        self._closed = False
+        self._tasks = []
+        self._started_at = None
+        self._finished_at = None
+
+    def start(self):
+        """启动worker"""
+        self._started_at = time.monotonic()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+
+    async def submit(self, cost, make_coroutine):
+        """提交一个工作单元，返回其结果的Future；make_coroutine为生成协程的无参函数"""
+        future = asyncio.get_running_loop().create_future()
+        async with self.condition:
+            # 工作量相同时先提交的先执行
+            heapq.heappush(self._heap, (-cost, next(self._sequence), time.monotonic(), make_coroutine, future))
+            self.condition.notify()
+        return future
+
+    async def _next(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self._heap or self._closed)
+            if not self._heap:
+                return None
+            return heapq.heappop(self._heap)
+
+    async def _worker(self, worker_index):
+        while True:
+            item = await self._next()
+            if item is None:
+                return
+            _, _, submitted, make_coroutine, future = item
+            started = time.monotonic()
+            if self.metrics is not None:
+                self.metrics.observe("queue_wait_seconds", started - submitted)
+            try:
+                result = await make_coroutine()
+                if not future.done():
+                    future.set_result(result)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                seconds = time.monotonic() - started
+                self.busy_seconds[worker_index] += seconds
+                self.units_done += 1
+                if self.metrics is not None:
+                    self.metrics.observe("work_unit_seconds", seconds)
+
+    async def close(self):
+        """不再提交新单元，等待队列中的单元全部完成后结束worker"""
+        async with self.condition:
+            self._closed = True
+            self.condition.notify_all()
+        await asyncio.gather(*self._tasks)
+        self._finished_at = time.monotonic()
+
+    def stats(self):
+        """worker利用率：忙碌时间之和除以worker数乘总时长"""
+        if self._started_at is None:
+            return None
+        wall = (self._finished_at or time.monotonic()) - self._started_at
+        busy = sum(self.busy_seconds)
+        capacity = wall * self.workers
+        return {
+            "workers": self.workers,
+            "units": self.units_done,
+            "wall_seconds": wall,
+            "busy_seconds": busy,
+            "idle_seconds": max(0.0, capacity - busy),
+            "utilization": busy / capacity if capacity else 0.0,
+            "max_idle_seconds": max(wall - seconds for seconds in self.busy_seconds)
+        }
@@ -0,0 +1,41 @@
+import threading
+
+from background_writer import BackgroundWriter
+
+
+def test_items_are_written_in_order_and_resources_released_in_thread():
+    batches = []
+    threads = []
+    release = threading.Event()
+
+    def write_batch(items):
+        release.wait(5)
+        batches.append(items)
+
+    writer = BackgroundWriter(write_batch, "test-writer", "写入出错", batch_size=3,
+                              on_exit=lambda: threads.append(threading.current_thread().name))
+    for i in range(7):
+        writer.put(i)
+    release.set()
+
+    assert writer.close()
+    assert [item for batch in batches for item in batch] == list(range(7))
+    assert all(len(batch) <= 3 for batch in batches)
+    assert threads == ["test-writer"]
+
+
+def test_write_errors_do_not_stop_the_thread(capsys):
+    written = []
+
+    def write_batch(items):
+        if 0 in items:
+            raise OSError("disk full")
+        written.extend(items)
+
+    writer = BackgroundWriter(write_batch, "test-writer", "写入出错", batch_size=1)
+    writer.put(0)
+    writer.put(1)
+
+    assert writer.close()
+    assert written == [1]
+    assert "写入出错: disk full" in capsys.readouterr().out
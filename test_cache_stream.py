@@ -0,0 +1,35 @@
+from cache_stream import CacheStreamWriter
+
+
+def read_file(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def test_stream_is_buffered_until_paragraph_boundary(tmp_path):
+    cache_file = tmp_path / "cache.md"
+    cache_file.write_text("# Title\n\n", encoding='utf-8')
+    progress = []
+    writer = CacheStreamWriter(str(cache_file), lambda *chars: progress.append(chars), progress_interval=0, flush_interval=60)
+
+    writer.reset()
+    writer.write_reasoning("思考")
+    writer.write("第一")
+    writer.write("句。")
+    assert read_file(cache_file) == "# Title\n\n"
+    writer.write("\n")
+    assert read_file(cache_file) == "# Title\n\n第一句。\n"
+    assert progress[-1] == (5, 2)
+
+    writer.finish()
+    assert read_file(cache_file) == "# Title\n\n"
+
+
+def test_stream_is_flushed_after_interval(tmp_path):
+    cache_file = tmp_path / "cache.md"
+    cache_file.write_text("", encoding='utf-8')
+    writer = CacheStreamWriter(str(cache_file), flush_interval=0)
+
+    writer.reset()
+    writer.write("译文")
+    assert read_file(cache_file) == "译文"
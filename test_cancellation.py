@@ -0,0 +1,117 @@
+import asyncio
+import time
+
+import pytest
+
+from cancellation import CancellationToken, OperationCancelled
+
+
+def run(coroutine_function):
+    token = CancellationToken()
+
+    async def main():
+        token.attach(asyncio.get_running_loop())
+        try:
+            return await coroutine_function(token)
+        finally:
+            token.detach()
+    return asyncio.run(main())
+
+
+def test_cancel_aborts_running_awaitable():
+    async def scenario(token):
+        asyncio.get_running_loop().call_later(0.05, token.cancel)
+        started = time.monotonic()
+        with pytest.raises(OperationCancelled):
+            await token.run(asyncio.sleep(10))
+        return time.monotonic() - started
+
+    assert run(scenario) < 1
+
+
+def test_run_returns_result_when_not_cancelled():
+    async def scenario(token):
+        async def work():
+            await asyncio.sleep(0.01)
+            return 42
+        return await token.run(work())
+
+    assert run(scenario) == 42
+
+
+def test_sleep_returns_early_on_cancel():
+    async def scenario(token):
+        asyncio.get_running_loop().call_later(0.05, token.cancel)
+        started = time.monotonic()
+        await token.sleep(10)
+        return time.monotonic() - started
+
+    assert run(scenario) < 1
+
+
+def test_pause_blocks_until_resume():
+    async def scenario(token):
+        token.pause()
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(token.wait_if_paused())
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+        token.resume()
+        await asyncio.wait_for(waiter, 1)
+
+    run(scenario)
+
+
+def test_cancel_releases_paused_waiters():
+    async def scenario(token):
+        token.pause()
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(token.wait_if_paused())
+        await asyncio.sleep(0.01)
+        token.cancel()
+        await asyncio.wait_for(waiter, 1)
+        assert token.cancelled
+
+    run(scenario)
+
+
+def test_clock_stops_while_paused():
+    token = CancellationToken()
+    start = token.clock()
+    token.pause()
+    time.sleep(0.1)
+    assert token.clock() - start < 0.05
+    token.resume()
+    time.sleep(0.05)
+    assert 0.04 < token.clock() - start < 0.1
+
+
+def test_run_until_times_out():
+    async def scenario(token):
+        with pytest.raises(asyncio.TimeoutError):
+            await token.run_until(asyncio.sleep(10), token.clock() + 0.05)
+
+    run(scenario)
+
+
+def test_run_until_does_not_count_paused_time():
+    async def scenario(token):
+        async def work():
+            await asyncio.sleep(0.2)
+            return "done"
+        loop = asyncio.get_running_loop()
+        token.pause()
+        loop.call_later(0.15, token.resume)
+        # 工作需要0.2秒，截止时间只有0.1秒，但其中0.15秒处于暂停状态
+        return await token.run_until(work(), token.clock() + 0.1)
+
+    assert run(scenario) == "done"
+
+
+def test_reset_clears_state():
+    token = CancellationToken()
+    token.cancel()
+    token.pause()
+    token.reset()
+    assert not token.cancelled
+    assert not token.paused
@@ -0,0 +1,62 @@
+import os
+
+from job_journal import JobJournal, make_job_id
+
+
+def test_resume_returns_recorded_translations(tmp_path):
+    journal = JobJournal(str(tmp_path), "job")
+    journal.record(1, 1, "Source one.", "译文一")
+    journal.record(1, 2, "Source two.", "译文二")
+    journal.close()
+
+    resumed = JobJournal(str(tmp_path), "job")
+    assert resumed.resumed_paragraphs == 2
+    assert resumed.get(1, 1, "Source one.") == "译文一"
+    assert resumed.get(1, 2, "Source two.") == "译文二"
+    # 原文变化或未完成的段落重新翻译
+    assert resumed.get(1, 1, "Changed source.") is None
+    assert resumed.get(2, 1, "Source one.") is None
+    resumed.close()
+
+
+def test_partial_last_line_is_discarded(tmp_path):
+    journal = JobJournal(str(tmp_path), "job")
+    journal.record(1, 1, "Source.", "译文")
+    journal.close()
+    with open(journal.path, 'a', encoding='utf-8') as f:
+        f.write('{"id": "1-2", "source": "Cut')
+
+    resumed = JobJournal(str(tmp_path), "job")
+    assert resumed.resumed_paragraphs == 1
+    resumed.record(1, 2, "Next.", "下一段")
+    resumed.close()
+
+    again = JobJournal(str(tmp_path), "job")
+    assert again.get(1, 2, "Next.") == "下一段"
+    again.close()
+
+
+def test_many_records_are_written_before_close_returns(tmp_path):
+    journal = JobJournal(str(tmp_path), "job", batch_size=7)
+    for number in range(1, 101):
+        journal.record(1, number, f"Source {number}.", f"译文 {number}")
+    journal.close()
+
+    with open(journal.path, 'r', encoding='utf-8') as f:
+        assert len(f.read().splitlines()) == 100
+
+
+def test_discard_removes_file(tmp_path):
+    journal = JobJournal(str(tmp_path), "job")
+    journal.record(1, 1, "Source.", "译文")
+    journal.discard()
+    assert not os.path.exists(journal.path)
+    journal.close()
+
+
+def test_job_id_depends_on_path_and_settings(tmp_path):
+    base = make_job_id("hash", "model", "prompt", 0.7, str(tmp_path / "a" / "full.md"))
+    assert base == make_job_id("hash", "model", "prompt", 0.7, str(tmp_path / "a" / "full.md"))
+    assert base != make_job_id("hash", "model", "prompt", 0.7, str(tmp_path / "b" / "full.md"))
+    assert base != make_job_id("hash", "other-model", "prompt", 0.7, str(tmp_path / "a" / "full.md"))
+    assert base != make_job_id("other-hash", "model", "prompt", 0.7, str(tmp_path / "a" / "full.md"))
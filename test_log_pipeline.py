@@ -0,0 +1,28 @@
+import json
+import threading
+
+from log_pipeline import INFO, JsonlLogSink
+
+
+def test_close_timeout_does_not_close_file_under_writer(tmp_path, monkeypatch):
+    release = threading.Event()
+    original_write_batch = JsonlLogSink._write_batch
+
+    def slow_write_batch(self, records):
+        release.wait(5)
+        original_write_batch(self, records)
+
+    monkeypatch.setattr(JsonlLogSink, "_write_batch", slow_write_batch)
+    path = tmp_path / "log.jsonl"
+    sink = JsonlLogSink(str(path))
+    sink.write(INFO, "第一条")
+    sink.write(INFO, "第二条")
+
+    sink.close(timeout=0.05)
+    assert not sink._file.closed
+    release.set()
+    sink._writer.close()
+
+    assert sink._file.closed
+    with open(path, encoding='utf-8') as f:
+        assert [json.loads(line)["message"] for line in f] == ["第一条", "第二条"]
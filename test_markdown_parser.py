@@ -0,0 +1,78 @@
+from markdown_parser import CODE, HEADING, IMAGE, LIST, MATH, PARAGRAPH, TABLE, iter_blocks, iter_chapters
+
+
+def parse(text, **kwargs):
+    return [(block.kind, block.text) for block in iter_blocks(text.splitlines(True), **kwargs)]
+
+
+def test_basic_blocks():
+    text = "# Title\n\nFirst paragraph\ncontinues here.\n\n- item one\n- item two\n\n![](images/a.jpg)\n\n| a | b |\n| --- | --- |\n"
+    assert parse(text) == [
+        (HEADING, "# Title"),
+        (PARAGRAPH, "First paragraph\ncontinues here."),
+        (LIST, "- item one\n- item two"),
+        (IMAGE, "![](images/a.jpg)"),
+        (TABLE, "| a | b |\n| --- | --- |")
+    ]
+
+
+def test_multiline_math_and_code():
+    text = "$$\ny = x\n$$\n\n```python\n# not a heading\nx = 1\n```\nAfter code.\n"
+    assert parse(text) == [
+        (MATH, "$$\ny = x\n$$"),
+        (CODE, "```python\n# not a heading\nx = 1\n```"),
+        (PARAGRAPH, "After code.")
+    ]
+
+
+def test_single_line_math():
+    assert parse("$$x=1$$\nText.\n") == [(MATH, "$$x=1$$"), (PARAGRAPH, "Text.")]
+    assert parse("\\[ a + b \\]\n") == [(MATH, "\\[ a + b \\]")]
+
+
+def test_inline_display_math_followed_by_text_is_translated():
+    text = "$$ y = 2 $$ where y is output.\n\n# Results\n\nMore text.\n"
+    assert parse(text) == [
+        (PARAGRAPH, "$$ y = 2 $$ where y is output."),
+        (HEADING, "# Results"),
+        (PARAGRAPH, "More text.")
+    ]
+
+
+def test_unclosed_math_ends_at_blank_line():
+    text = "$$ y = 2\n\n# Results\n\nMore text.\n\n# References\n\nCited work.\n"
+    blocks = parse(text)
+    assert blocks[0] == (MATH, "$$ y = 2")
+    assert (HEADING, "# Results") in blocks
+    assert (PARAGRAPH, "More text.") in blocks
+    chapters = [title for title, _ in iter_chapters(iter_blocks(text.splitlines(True)), ("# references",))]
+    assert chapters == [None, "# Results"]
+
+
+def test_unclosed_math_ends_at_max_block_chars():
+    text = "$$\n" + "x + y\n" * 50
+    blocks = parse(text, max_block_chars=100)
+    assert len(blocks) > 1
+    assert blocks[0][0] == MATH
+    assert len(blocks[0][1].replace("\n", "")) <= 100 + len("x + y")
+
+
+def test_unclosed_fence_ends_at_heading():
+    text = "```\ncode line\n\n# Results\n\nTranslated paragraph.\n"
+    assert parse(text) == [
+        (CODE, "```\ncode line\n"),
+        (HEADING, "# Results"),
+        (PARAGRAPH, "Translated paragraph.")
+    ]
+
+
+def test_unclosed_fence_ends_at_eof():
+    assert parse("```\ncode line\n") == [(CODE, "```\ncode line")]
+
+
+def test_long_paragraph_is_split_at_line_boundary():
+    text = "".join(f"line {i} of a long paragraph\n" for i in range(20))
+    blocks = parse(text, max_block_chars=100)
+    assert len(blocks) > 1
+    assert all(kind == PARAGRAPH for kind, _ in blocks)
+    assert "\n".join(block for _, block in blocks) == text.rstrip("\n")
@@ -0,0 +1,47 @@
+from packing import SINGLE_MESSAGE_TEMPLATE, build_user_message, pack_paragraphs, split_packed_response, split_paragraph
+from token_utils import estimate_tokens
+
+
+def test_pack_respects_token_budget():
+    paragraphs = [f"Paragraph number {i} with several words in it." for i in range(10)]
+    budget = estimate_tokens(paragraphs[0]) * 3
+    units = pack_paragraphs(paragraphs, budget)
+    assert [p for unit in units for p in unit] == paragraphs
+    assert all(sum(estimate_tokens(p) for p in unit) <= budget for unit in units)
+    assert len(units) == 4
+
+
+def test_pack_respects_max_paragraphs():
+    units = pack_paragraphs(["a"] * 7, 10000, max_paragraphs=3)
+    assert [len(unit) for unit in units] == [3, 3, 1]
+
+
+def test_oversized_paragraph_is_its_own_unit():
+    long_paragraph = "word " * 500
+    units = pack_paragraphs(["short", long_paragraph, "short"], 50)
+    assert units == [["short"], [long_paragraph], ["short"]]
+
+
+def test_single_paragraph_message_keeps_original_format():
+    assert build_user_message(["Text."]) == SINGLE_MESSAGE_TEMPLATE.format("Text.")
+
+
+def test_packed_message_round_trip():
+    paragraphs = ["First.", "Second.", "Third."]
+    message = build_user_message(paragraphs)
+    assert "@@1@@ First." in message and "@@3@@ Third." in message
+    response = "@@1@@ 第一。\n\n@@2@@ 第二。\n\n@@3@@ 第三。"
+    assert split_packed_response(response, 3) == ["第一。", "第二。", "第三。"]
+
+
+def test_split_rejects_misaligned_responses():
+    assert split_packed_response("@@1@@ 一\n@@2@@ 二", 3) is None
+    assert split_packed_response("@@2@@ 二\n@@1@@ 一", 2) is None
+    assert split_packed_response("@@1@@ 一\n@@2@@ ", 2) is None
+    assert split_packed_response("没有编号的回复", 1) is None
+
+
+def test_split_paragraph_prefers_line_then_sentence_boundaries():
+    assert split_paragraph("First line.\nSecond line. Still second.") == ("First line.", "Second line. Still second.", "\n")
+    assert split_paragraph("One. Two. Three. Four.") == ("One. Two.", "Three. Four.", "")
+    assert split_paragraph("No boundary here") is None
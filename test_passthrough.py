@@ -0,0 +1,17 @@
+from passthrough import CHINESE, FIGURE_LABEL, FORMULA, IMAGE, LINK, NUMERIC, classify
+
+
+def test_untranslatable_blocks():
+    assert classify("![](images/a.jpg)") == IMAGE
+    assert classify("| 1.23 | 4.56 | (0.01) |") == NUMERIC
+    assert classify("$x_1 + y$ = 3") == FORMULA
+    assert classify("DOI: 10.1000/xyz123") == LINK
+    assert classify("Figure 3.") == FIGURE_LABEL
+    assert classify("这是已经翻译好的中文段落。") == CHINESE
+
+
+def test_non_ascii_letters_are_translated():
+    assert classify("Экономический рост и инфляция") is None
+    assert classify("Η οικονομική ανάπτυξη") is None
+    assert classify("Économie générale à l'été") is None
+    assert classify("Größe: 12 € — ça") is None
@@ -0,0 +1,66 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+from rate_limiter import RateLimiter, backoff_delay, get_rate_limiter, parse_retry_after
+
+
+def timed_acquires(limiter, count, tokens=0):
+    async def main():
+        started = time.monotonic()
+        for _ in range(count):
+            await limiter.acquire(tokens)
+        return time.monotonic() - started
+    return asyncio.run(main())
+
+
+def test_unlimited_does_not_wait():
+    assert timed_acquires(RateLimiter(), 100) < 0.05
+
+
+def test_requests_per_minute_allows_burst_then_waits():
+    # 每分钟600次，即每0.1秒补充一次
+    limiter = RateLimiter(requests_per_minute=600)
+    limiter.request_bucket.tokens = 2
+    elapsed = timed_acquires(limiter, 4)
+    assert 0.15 <= elapsed < 0.5
+
+
+def test_tokens_per_minute_waits_for_token_budget():
+    # 每分钟6000个token，即每秒100个
+    limiter = RateLimiter(tokens_per_minute=6000)
+    limiter.token_bucket.tokens = 0
+    elapsed = timed_acquires(limiter, 1, tokens=20)
+    assert 0.15 <= elapsed < 0.5
+
+
+def test_request_larger_than_capacity_does_not_wait_forever():
+    limiter = RateLimiter(tokens_per_minute=60)
+    assert timed_acquires(limiter, 1, tokens=1000) < 0.05
+
+
+def test_pause_blocks_acquire():
+    limiter = RateLimiter()
+    limiter.pause(0.2)
+    assert 0.15 <= timed_acquires(limiter, 1) < 0.5
+
+
+def test_limiter_is_shared_per_provider_and_key():
+    assert get_rate_limiter("p", "test-shared") is get_rate_limiter("p", "test-shared")
+    assert get_rate_limiter("p", "test-shared") is not get_rate_limiter("p", "test-other")
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("-1") == 0.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    future = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 25 <= parse_retry_after(future) <= 31
+
+
+def test_backoff_delay_is_bounded():
+    for attempt in range(10):
+        delay = backoff_delay(attempt, base=1.0, max_delay=8.0)
+        assert 0 <= delay <= min(8.0, 2 ** attempt)
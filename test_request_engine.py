@@ -0,0 +1,165 @@
+import asyncio
+
+import pytest
+
+import request_engine
+from benchmarks.mock_server import MockServerConfig
+from cache_stream import CacheStreamWriter
+from conftest import MODEL, PROVIDER, make_request_engine
+from request_engine import ReplyTruncated
+
+
+def run_requests(engine, count):
+    async def main():
+        try:
+            return [await engine.chat_completion([{"role": "user", "content": f"Paragraph {i}."}])
+                    for i in range(count)]
+        finally:
+            await engine.aclose()
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize("stream", [True, False])
+def test_connections_are_reused(server, stream):
+    engine = make_request_engine(stream=stream)
+    results = run_requests(engine, 5)
+    assert all(results)
+    stats = engine.client_pool.stats()[PROVIDER]
+    assert stats["requests"] == 5
+    assert stats["misses"] == 1
+
+
+def test_zero_stream_idle_timeout_means_no_limit(server):
+    engine = make_request_engine(stream=True, stream_idle_timeout=0)
+    assert all(run_requests(engine, 2))
+
+
+def test_deadline_does_not_run_while_paused(server):
+    engine = make_request_engine(stream=True)
+    token = engine.cancel_token
+
+    async def main():
+        token.attach(asyncio.get_running_loop())
+        try:
+            token.pause()
+            asyncio.get_running_loop().call_later(0.5, token.resume)
+            return await engine.chat_completion([{"role": "user", "content": "Paragraph."}],
+                                                deadline=token.clock() + 0.3)
+        finally:
+            token.detach()
+            await engine.aclose()
+
+    assert asyncio.run(main())
+
+
+def test_deadline_aborts_slow_request(server):
+    server.reset(MockServerConfig(latency_median=2.0, latency_sigma=0.01))
+    engine = make_request_engine(stream=True)
+
+    async def main():
+        try:
+            return await engine.chat_completion([{"role": "user", "content": "Paragraph."}],
+                                                deadline=engine.cancel_token.clock() + 0.2)
+        finally:
+            await engine.aclose()
+
+    assert asyncio.run(main()) is None
+    assert engine.metrics.counter_value("chat_completions_total", outcome="deadline") == 1
+
+
+def test_rate_limited_requests_pause_the_key_and_retry(server, monkeypatch):
+    server.reset(MockServerConfig(latency_median=0.01, latency_sigma=0.01, rate_limit_ratio=0.5, retry_after=0.05, seed=3))
+    engine = make_request_engine(stream=False, max_retries=10)
+    paused = []
+    limiter = engine.router.routes[0].rate_limiter
+    original_pause = limiter.pause
+
+    def record_pause(seconds):
+        paused.append(seconds)
+        original_pause(seconds)
+
+    monkeypatch.setattr(limiter, "pause", record_pause)
+    assert all(run_requests(engine, 4))
+    assert server.stats.rate_limited > 0
+    assert len(paused) == engine.metrics.counter_value("request_errors_total", error="http_429") == server.stats.rate_limited
+    assert all(seconds >= 0.05 for seconds in paused)
+
+
+@pytest.mark.parametrize("stream", [True, False])
+def test_length_limited_reply_is_not_returned(server, stream):
+    engine = make_request_engine(stream=stream, max_tokens=5)
+
+    async def main():
+        try:
+            return await engine.chat_completion([{"role": "user", "content": "A paragraph that is too long. " * 5}])
+        finally:
+            await engine.aclose()
+
+    with pytest.raises(ReplyTruncated):
+        asyncio.run(main())
+    assert server.stats.requests == 1
+    assert engine.metrics.counter_value("chat_completions_total", outcome="length") == 1
+
+
+def make_hedging_engine(parallel_count):
+    engine = make_request_engine(stream=False, parallel_count=parallel_count, hedge_requests=True,
+                         hedge_min_delay=0.05, hedge_max_ratio=1.0)
+    for _ in range(engine.hedge_policy.min_samples):
+        engine.hedge_policy.tracker.record((PROVIDER, MODEL), 0.01)
+    return engine
+
+
+@pytest.mark.parametrize("parallel_count, sent", [(2, 2), (1, 1)])
+def test_hedge_needs_a_free_concurrency_slot(server, parallel_count, sent):
+    server.reset(MockServerConfig(latency_median=0.3, latency_sigma=0.01))
+    engine = make_hedging_engine(parallel_count)
+    assert all(run_requests(engine, 1))
+    assert server.stats.requests == sent
+
+
+def test_no_hedge_while_paused(server):
+    server.reset(MockServerConfig(latency_median=0.3, latency_sigma=0.01))
+    engine = make_hedging_engine(2)
+    token = engine.cancel_token
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        token.attach(loop)
+        loop.call_later(0.02, token.pause)
+        loop.call_later(0.5, token.resume)
+        try:
+            return await engine.chat_completion([{"role": "user", "content": "Paragraph."}])
+        finally:
+            token.detach()
+            await engine.aclose()
+
+    assert asyncio.run(main())
+    assert server.stats.requests == 1
+
+
+def test_reasoning_is_reported_but_not_translated(server):
+    server.reset(MockServerConfig(latency_median=0.01, latency_sigma=0.01, reasoning_chars=50))
+    engine = make_request_engine(stream=True)
+    sink = CacheStreamWriter()
+
+    async def main():
+        try:
+            return await engine.chat_completion([{"role": "user", "content": "Paragraph."}], sink)
+        finally:
+            await engine.aclose()
+
+    result = asyncio.run(main())
+    assert result and "思" not in result
+    assert sink.reasoning_chars == 50
+    assert sink.received_chars == len(result)
+
+
+def test_reply_reports_the_model_of_the_serving_route(server, monkeypatch):
+    # 主线路连接被拒绝，请求转到备用线路
+    monkeypatch.setitem(request_engine.PROVIDER_API_URLS, PROVIDER, "http://127.0.0.1:9/chat/completions")
+    monkeypatch.setitem(request_engine.PROVIDER_API_URLS, "硅基流动", server.url)
+    engine = make_request_engine(stream=False, extra_routes=["硅基流动:backup-model:backup-key"])
+
+    reply, = run_requests(engine, 1)
+
+    assert reply and reply.model == "backup-model"
@@ -0,0 +1,48 @@
+import time
+
+from translation_memory import TranslationMemory
+
+SETTINGS = ("model", "prompt", 0.7)
+
+
+def test_put_is_visible_before_it_is_written(tmp_path):
+    memory = TranslationMemory(str(tmp_path / "tm.db"))
+    memory.put("Source.", *SETTINGS, "译文")
+    assert memory.get("Source.", *SETTINGS) == "译文"
+    assert memory.get("Other.", *SETTINGS) is None
+    assert memory.get("Source.", "other-model", "prompt", 0.7) is None
+    memory.close()
+
+
+def test_translations_persist_across_runs(tmp_path):
+    memory = TranslationMemory(str(tmp_path / "tm.db"))
+    for index in range(50):
+        memory.put(f"Source {index}.", *SETTINGS, f"译文 {index}")
+    memory.close()
+
+    memory = TranslationMemory(str(tmp_path / "tm.db"))
+    assert memory.get("Source 49.", *SETTINGS) == "译文 49"
+    assert memory.hits == 1
+    assert memory.lookups == 1
+    memory.close()
+
+
+def test_evicts_least_recently_used(tmp_path):
+    memory = TranslationMemory(str(tmp_path / "tm.db"), max_entries=2)
+    memory.put("First.", *SETTINGS, "一")
+    memory.flush()
+    time.sleep(0.01)
+    memory = _reopen(memory, tmp_path, max_entries=2)
+    memory.put("Second.", *SETTINGS, "二")
+    memory.put("Third.", *SETTINGS, "三")
+    memory.close()
+
+    memory = TranslationMemory(str(tmp_path / "tm.db"), max_entries=2)
+    assert memory.get("First.", *SETTINGS) is None
+    assert memory.get("Third.", *SETTINGS) == "三"
+    memory.close()
+
+
+def _reopen(memory, tmp_path, **kwargs):
+    memory.close()
+    return TranslationMemory(str(tmp_path / "tm.db"), **kwargs)
@@ -0,0 +1,160 @@
+import asyncio
+import os
+
+import pytest
+
+from benchmarks.mock_server import MockServerConfig
+from benchmarks.synthetic_papers import generate_paper
+from conftest import MODEL, PROVIDER, make_translation_engine
+from context_window import ContextWindow
+from request_engine import Reply
+from translation_memory import TranslationMemory
+
+
+def write_file(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    return str(path)
+
+
+def read_file(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def test_identical_files_in_one_queue_do_not_share_state(server, tmp_path):
+    # 耗时差异大，两个文件的段落交错完成
+    server.reset(MockServerConfig(latency_median=0.02, latency_sigma=0.5, tokens_per_second=100000))
+    content = generate_paper(1, sections=4, paragraphs=4)
+    files = [write_file(tmp_path / name / "full.md", content) for name in ("a", "b")]
+    engine = make_translation_engine(tmp_path, parallel_count=4, max_active_files=0, segment_min_tokens=50, segment_max_tokens=120)
+
+    jobs = engine.translation_process(files)
+
+    assert len(jobs) == 2
+    assert jobs[0].job_id != jobs[1].job_id
+    paths = {job.merged_file_path for job in jobs}
+    assert len(paths) == 2
+    outputs = [read_file(path) for path in paths]
+    assert outputs[0] == outputs[1]
+    assert "【" not in outputs[0]
+    for job in jobs:
+        assert job.completed_paragraphs == job.total_paragraphs
+    # 两个任务都已完成，各自的任务日志都已删除
+    assert os.listdir(tmp_path / "cache" / "journal") == []
+
+
+def test_same_source_name_in_same_second_keeps_both_results(server, tmp_path):
+    files = [write_file(tmp_path / name / "full.md", f"# Title\n\nParagraph from {name}.\n") for name in ("a", "b")]
+    engine = make_translation_engine(tmp_path, parallel_count=2)
+
+    jobs = engine.translation_process(files)
+
+    paths = [job.merged_file_path for job in jobs]
+    assert len(set(paths)) == 2
+    assert all(os.path.exists(path) for path in paths)
+
+
+def test_paragraph_metrics_have_no_per_file_label(server, tmp_path):
+    files = [write_file(tmp_path / name / "paper.md", f"# Title\n\nParagraph from {name}.\n\n$$x=1$$\n") for name in ("a", "b")]
+    engine = make_translation_engine(tmp_path, parallel_count=2)
+
+    jobs = engine.translation_process(files)
+
+    for job in jobs:
+        assert job.paragraph_counts == {"translated": 1, "passthrough": 1}
+    assert engine.metrics.label_values("paragraphs_total", "file") == [(None,)]
+    assert engine.metrics.counter_value("paragraphs_total", source="translated") == 2
+    assert "file=" not in engine.metrics.to_prometheus()
+
+
+@pytest.mark.parametrize("segment_min_tokens", [0, 50])
+def test_long_chapters_are_split_only_when_enabled(server, tmp_path, segment_min_tokens):
+    files = [write_file(tmp_path / "a" / "paper.md", generate_paper(1, sections=2, paragraphs=12))]
+    engine = make_translation_engine(tmp_path, parallel_count=4, segment_min_tokens=segment_min_tokens)
+
+    jobs = engine.translation_process(files)
+
+    chapters = len(jobs[0].filtered_batches)
+    if segment_min_tokens:
+        assert len(jobs[0].segments) > chapters
+    else:
+        assert len(jobs[0].segments) == chapters
+    assert jobs[0].completed_paragraphs == jobs[0].total_paragraphs
+
+
+@pytest.mark.parametrize("responses, expected, calls", [
+    ([None, "译文"], None, 1),
+    (["", " ", "译文"], "译文", 3),
+    (["", "", "", "译文"], None, 3),
+])
+def test_paragraph_is_reasked_only_for_empty_replies(tmp_path, responses, expected, calls):
+    engine = make_translation_engine(tmp_path)
+    replies = iter(responses)
+    sent = []
+
+    async def chat_completion(messages, stream_sink=None, deadline=None, job=None):
+        sent.append(messages)
+        reply = next(replies)
+        return None if reply is None else Reply(reply, MODEL)
+
+    engine.chat_completion = chat_completion
+    result = asyncio.run(engine._translate_paragraph(ContextWindow(4, 4000), "Paragraph.", 1, 1))
+
+    assert result == expected
+    assert len(sent) == calls
+
+
+@pytest.mark.parametrize("packed_reply, requests, translated", [
+    (None, 1, 0),
+    ("没有编号的回复", 4, 3),
+])
+def test_packed_request_falls_back_only_when_reply_cannot_be_split(tmp_path, packed_reply, requests, translated):
+    files = [write_file(tmp_path / "a" / "paper.md", "# Title\n\nOne.\n\nTwo.\n\nThree.\n")]
+    engine = make_translation_engine(tmp_path, pack_paragraphs=True)
+    messages_sent = []
+
+    async def chat_completion(messages, stream_sink=None, deadline=None):
+        messages_sent.append(messages)
+        if "@@1@@" not in messages[-1]["content"]:
+            return Reply("译文", MODEL)
+        return None if packed_reply is None else Reply(packed_reply, MODEL)
+
+    engine.request_engine.chat_completion = chat_completion
+    job, = engine.translation_process(files)
+
+    assert len(messages_sent) == job.request_units == requests
+    assert job.paragraph_counts.get("translated", 0) == translated
+    assert job.paragraph_counts.get("failed", 0) == 3 - translated
+
+
+def test_truncated_reply_is_split_and_not_saved(server, tmp_path):
+    sentences = " ".join(f"Sentence number {i} has quite a few words in it." for i in range(4))
+    files = [write_file(tmp_path / "a" / "paper.md", f"# Title\n\n{sentences}\n")]
+    engine = make_translation_engine(tmp_path, max_tokens=40)
+
+    job, = engine.translation_process(files)
+
+    assert engine.metrics.counter_value("truncated_replies_total", provider=PROVIDER, model=MODEL) > 0
+    assert job.completed_paragraphs == job.total_paragraphs == 1
+    assert "【翻译失败】" not in read_file(job.merged_file_path)
+
+
+def test_memory_is_keyed_by_the_model_that_served_the_reply(tmp_path):
+    files = [write_file(tmp_path / "a" / "paper.md", "# Title\n\nParagraph.\n")]
+    engine = make_translation_engine(tmp_path, use_translation_memory=True,
+                                     translation_memory_path=str(tmp_path / "memory.db"))
+
+    async def chat_completion(messages, stream_sink=None, deadline=None):
+        return Reply("译文", "backup-model")
+
+    engine.request_engine.chat_completion = chat_completion
+    engine.translation_process(files)
+
+    memory = TranslationMemory(str(tmp_path / "memory.db"))
+    try:
+        assert memory.get("Paragraph.", "backup-model", engine.prompt_key, engine.config.temperature) == "译文"
+        assert memory.get("Paragraph.", MODEL, engine.prompt_key, engine.config.temperature) is None
+    finally:
+        memory.close()
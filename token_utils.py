@@ -0,0 +1,29 @@
+import re
+
+# 中日韩字符大致一个字一个token，其余文本大致四个字符一个token
+_CJK_PATTERN = re.compile(r'[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]')
+
+# 非中日韩文本每个token的平均字符数
+CHARS_PER_TOKEN = 4
+
+# 每条消息的格式开销（角色、分隔符等）
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def count_cjk(text):
+    """统计中日韩字符（含全角标点）的数量"""
+    return len(_CJK_PATTERN.findall(text))
+
+
+def estimate_tokens(text):
+    """本地粗略估算文本的token数，不依赖具体模型的分词器"""
+    if not text:
+        return 0
+    cjk_count = count_cjk(text)
+    other_count = len(text) - cjk_count
+    return cjk_count + (other_count + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def estimate_message_tokens(messages):
+    """估算一组对话消息的输入token数"""
+    return sum(estimate_tokens(msg["content"]) + MESSAGE_OVERHEAD_TOKENS for msg in messages)
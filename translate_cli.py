@@ -0,0 +1,198 @@
+import argparse
+import os
+import sys
+
+from log_pipeline import DEBUG, INFO
+from progress import ProgressReporter
+from translator_engine import (
+    DEFAULT_MODELS,
+    DEFAULT_SEGMENT_MIN_TOKENS,
+    PROVIDER_MODELS,
+    EngineListener,
+    TranslationConfig,
+    TranslationEngine,
+)
+
+
+def collect_markdown_files(paths):
+    """展开命令行给出的文件和目录，返回去重后的markdown文件列表"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for dir_path, _, file_names in os.walk(path):
+                for file_name in sorted(file_names):
+                    if file_name.lower().endswith('.md'):
+                        files.append(os.path.join(dir_path, file_name))
+        elif path.lower().endswith('.md'):
+            files.append(path)
+        else:
+            print(f"忽略非markdown文件: {path}", file=sys.stderr)
+
+    unique_files = []
+    for file_path in files:
+        if file_path not in unique_files:
+            unique_files.append(file_path)
+    return unique_files
+
+
+class ProgressPrinter:
+    """汇总各文件的进度快照，在标准错误输出中刷新一行总进度"""
+
+    def __init__(self, stream=sys.stderr):
+        self.stream = stream
+        self.files = {}
+
+    def __call__(self, snapshot):
+        self.files.update(snapshot.files)
+        completed = sum(done for done, _ in self.files.values())
+        total = sum(count for _, count in self.files.values())
+        if total:
+            self.stream.write(f"\r进度: {completed}/{total} 段（{completed / total:.1%}），{len(self.files)} 个文件")
+            self.stream.flush()
+
+
+def build_parser():
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="学术论文翻译助手（命令行版）")
+    parser.add_argument("inputs", nargs="+", help="待翻译的markdown文件或包含markdown文件的目录")
+    parser.add_argument("--provider", choices=list(PROVIDER_MODELS), default="Deepseek", help="API提供商")
+    parser.add_argument("--api-key", default=os.environ.get("TRANSLATOR_API_KEY", ""),
+                        help="API Key，默认读取环境变量TRANSLATOR_API_KEY")
+    parser.add_argument("--model", help="模型名称，默认使用提供商的默认模型")
+    parser.add_argument("--temperature", type=float, default=0.7, help="温度")
+    parser.add_argument("--max-tokens", type=int, default=1024, help="最大Token")
+    parser.add_argument("--parallel", type=int, default=3, help="整个任务同时在途的最大请求数")
+    parser.add_argument("--result-path", default=os.path.join(base_dir, "TranslateResult"), help="翻译结果保存路径")
+    parser.add_argument("--cache-path", default=os.path.join(base_dir, "cache"), help="缓存文件保存路径")
+    parser.add_argument("--pool-max-connections", type=int, default=100, help="每个提供商的最大连接数")
+    parser.add_argument("--pool-max-keepalive", type=int, default=20, help="每个提供商保持的空闲长连接数")
+    parser.add_argument("--pool-keepalive-expiry", type=float, default=30.0, help="空闲长连接的保持时间（秒）")
+    parser.add_argument("--no-http2", action="store_true", help="禁用HTTP/2，仅使用HTTP/1.1长连接")
+    parser.add_argument("--rpm", type=int, default=0, help="每分钟最大请求数，0表示不限制")
+    parser.add_argument("--tpm", type=int, default=0, help="每分钟最大token数，0表示不限制")
+    parser.add_argument("--max-retries", type=int, default=5, help="请求失败后的最大重试次数")
+    parser.add_argument("--pack", action="store_true", help="将连续的短段落合并为一个请求")
+    parser.add_argument("--pack-token-budget", type=int, default=800, help="每个合并请求的原文token预算")
+    parser.add_argument("--context-turns", type=int, default=0, help="上下文保留的最近对话轮数，0表示使用模型默认值")
+    parser.add_argument("--context-tokens", type=int, default=0, help="上下文历史对话的token上限，0表示使用模型默认值")
+    parser.add_argument("--memory-path", default=os.path.join(base_dir, "translation_memory.db"), help="翻译记忆库文件")
+    parser.add_argument("--no-memory", action="store_true", help="不使用翻译记忆，所有段落重新翻译")
+    parser.add_argument("--max-active-files", type=int, default=4, help="流水线中同时处理的最大文件数，0表示不限制")
+    parser.add_argument("--split-chapters", action="store_true",
+                        help=f"将长章节拆分为片段并行翻译（每段至少{DEFAULT_SEGMENT_MIN_TOKENS}个原文token，可用--segment-min-tokens修改）")
+    parser.add_argument("--segment-min-tokens", type=int, default=0,
+                        help="长章节拆分为并行片段时每段的最少原文token数，大于0时开启拆分，默认不拆分")
+    parser.add_argument("--segment-max-tokens", type=int, default=0,
+                        help="每个片段的最大原文token数，大于0时同一章节按此拆分并行翻译，0表示自动确定")
+    parser.add_argument("--source-context", type=int, default=3, help="拆分出的片段开头附带的前文原文段落数")
+    parser.add_argument("--glossary", default="", help="术语表文件，每行“原文=译文”或以制表符分隔")
+    parser.add_argument("--route", action="append", default=[], metavar="提供商:模型[:API Key]",
+                        help="备用线路，可重复指定；请求按各线路的耗时和错误率分配，出错时自动转到其他线路")
+    parser.add_argument("--hedge", action="store_true", help="请求耗时超过滚动p95时发送对冲请求，取先完成的结果")
+    parser.add_argument("--hedge-max-ratio", type=float, default=0.1, help="对冲请求数占总请求数的上限")
+    parser.add_argument("--no-stream", action="store_true", help="不使用流式响应，等待完整回复")
+    parser.add_argument("--stream-idle-timeout", type=float, default=60.0, help="流式响应两段数据之间的最长等待时间（秒）")
+    parser.add_argument("--connect-timeout", type=float, default=10.0, help="建立连接的超时（秒），0表示不限制")
+    parser.add_argument("--read-timeout", type=float, default=300.0, help="两次收到数据之间的最长等待时间（秒），0表示不限制")
+    parser.add_argument("--request-timeout", type=float, default=900.0,
+                        help="单次请求从发出到收完回复的总超时（秒），超时后重试，0表示不限制")
+    parser.add_argument("--paragraph-deadline", type=float, default=0.0,
+                        help="每段包括重试在内的最长翻译时间（秒），超过则记为失败，0表示不限制")
+    parser.add_argument("--job-deadline", type=float, default=0.0,
+                        help="每个文件从该文件开始翻译起的最长时间（秒，按文件分别计算，流水线中后开始的文件截止得更晚），"
+                             "超过后未完成的段落记为失败，0表示不限制")
+    parser.add_argument("--task-deadline", type=float, default=0.0,
+                        help="整个任务（所有文件）从开始起的最长时间（秒），超过后未完成的段落记为失败，0表示不限制")
+    parser.add_argument("--dry-run", action="store_true", help="只解析文件并估算请求数、token用量、费用和耗时，不调用API")
+    parser.add_argument("--no-passthrough", action="store_true", help="不识别无需翻译的段落，所有段落都发送给模型")
+    parser.add_argument("--metrics-file", default="",
+                        help="导出请求指标的文件，扩展名为.prom时为Prometheus文本格式，否则为JSON")
+    parser.add_argument("--progress", action="store_true", help="在标准错误输出中每0.5秒刷新一次总进度")
+    parser.add_argument("--verbose", action="store_true", help="在控制台输出每段的原文和译文")
+    parser.add_argument("--log-file", default="", help="将完整日志（含原文和译文）以JSON行格式写入该文件")
+    return parser
+
+
+def config_from_args(args):
+    """根据命令行参数生成翻译配置"""
+    return TranslationConfig(
+        api_provider=args.provider,
+        api_key=args.api_key,
+        model=args.model or DEFAULT_MODELS[args.provider],
+        temperature=args.temperature,
+        max_tokens=args.max_tokens,
+        parallel_count=args.parallel,
+        result_path=args.result_path,
+        cache_path=args.cache_path,
+        pool_max_connections=args.pool_max_connections,
+        pool_max_keepalive=args.pool_max_keepalive,
+        pool_keepalive_expiry=args.pool_keepalive_expiry,
+        http2=not args.no_http2,
+        requests_per_minute=args.rpm,
+        tokens_per_minute=args.tpm,
+        max_retries=args.max_retries,
+        pack_paragraphs=args.pack,
+        pack_token_budget=args.pack_token_budget,
+        context_turns=args.context_turns,
+        context_tokens=args.context_tokens,
+        use_translation_memory=not args.no_memory,
+        translation_memory_path=args.memory_path,
+        max_active_files=args.max_active_files,
+        segment_min_tokens=args.segment_min_tokens or (DEFAULT_SEGMENT_MIN_TOKENS if args.split_chapters else 0),
+        segment_max_tokens=args.segment_max_tokens,
+        source_context_paragraphs=args.source_context,
+        glossary_path=args.glossary,
+        extra_routes=args.route,
+        hedge_requests=args.hedge,
+        hedge_max_ratio=args.hedge_max_ratio,
+        stream=not args.no_stream,
+        stream_idle_timeout=args.stream_idle_timeout,
+        connect_timeout=args.connect_timeout,
+        read_timeout=args.read_timeout,
+        request_timeout=args.request_timeout,
+        paragraph_deadline=args.paragraph_deadline,
+        job_deadline=args.job_deadline,
+        task_deadline=args.task_deadline,
+        passthrough_filter=not args.no_passthrough,
+        log_file=args.log_file,
+        metrics_path=args.metrics_file
+    )
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if not args.api_key and not args.dry_run:
+        parser.error("请通过--api-key或环境变量TRANSLATOR_API_KEY提供API Key")
+
+    file_queue = collect_markdown_files(args.inputs)
+    if not file_queue:
+        parser.error("没有找到可翻译的markdown文件")
+
+    listener = EngineListener(DEBUG if args.verbose else INFO)
+    engine = TranslationEngine(config_from_args(args), listener)
+    if args.dry_run:
+        engine.dry_run(file_queue)
+        return 0
+
+    reporter = None
+    if args.progress:
+        reporter = ProgressReporter(engine.progress, ProgressPrinter())
+        reporter.start()
+    try:
+        jobs = engine.translation_process(file_queue)
+    except KeyboardInterrupt:
+        engine.stop()
+        print("翻译任务已停止", file=sys.stderr)
+        return 130
+    finally:
+        if reporter is not None:
+            reporter.stop()
+            print(file=sys.stderr)
+
+    return 0 if len(jobs) == len(file_queue) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
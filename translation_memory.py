@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from background_writer import BackgroundWriter
+from token_utils import estimate_tokens
+
+
+class TranslationMemory:
+    """持久化的翻译记忆库（SQLite），以原文、模型、提示词和温度的哈希为键
+
+    同一段原文在相同翻译设置下只需翻译一次，之后的运行直接复用译文。
+    按条目数（最近最少使用）和最长保存天数淘汰旧条目。
+    写入（保存译文、更新最近使用时间）在后台线程中用单独的连接批量提交，查询不等待磁盘IO；
+    尚未提交的译文保存在内存中，提交前也能查到。
+    """
+
+    def __init__(self, db_path, max_entries=200000, max_age_days=180, batch_size=200):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self.lookups = 0
+        self.hits = 0
+        self.tokens_saved = 0
+        self._lock = threading.Lock()
+        self._pending = {}  # 已提交给后台线程但尚未写入数据库的译文：键 -> (译文, token数)
+        self._writer_conn = None  # 后台线程使用的连接
+
+        db_dir = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(db_dir, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS translations (
+                key TEXT PRIMARY KEY,
+                translation TEXT NOT NULL,
+                model TEXT NOT NULL,
+                tokens INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_translations_last_used ON translations(last_used)")
+        self._conn.commit()
+        self.evict()
+        self._writer = BackgroundWriter(self._write, "translation-memory-writer", "写入翻译记忆库出错", batch_size,
+                                        on_start=self._open_writer_conn, on_exit=self._close_writer_conn)
+
+    @staticmethod
+    def make_key(source, model, prompt, temperature):
+        """计算记忆库的键"""
+        content = json.dumps([source, model, prompt, float(temperature)], ensure_ascii=False)
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def get(self, source, model, prompt, temperature):
+        """查询译文，未命中时返回None"""
+        key = self.make_key(source, model, prompt, temperature)
+        with self._lock:
+            self.lookups += 1
+            row = self._pending.get(key)
+            if row is None:
+                row = self._conn.execute(
+                    "SELECT translation, tokens FROM translations WHERE key = ?", (key,)
+                ).fetchone()
+            if row is None:
+                return None
+            self.hits += 1
+            self.tokens_saved += row[1]
+        self._writer.put(("touch", (time.time(), key)))
+        return row[0]
+
+    def put(self, source, model, prompt, temperature, translation):
+        """保存译文"""
+        key = self.make_key(source, model, prompt, temperature)
+        tokens = estimate_tokens(prompt) + estimate_tokens(source) + estimate_tokens(translation)
+        now = time.time()
+        with self._lock:
+            self._pending[key] = (translation, tokens)
+        self._writer.put(("put", (key, translation, model, tokens, now, now)))
+
+    def _open_writer_conn(self):
+        self._writer_conn = sqlite3.connect(self.db_path)
+
+    def _close_writer_conn(self):
+        if self._writer_conn is not None:
+            self._writer_conn.close()
+            self._writer_conn = None
+
+    def _write(self, items):
+        """在后台线程中将积压的写入放在一个事务中提交"""
+        conn = self._writer_conn
+        keys = []
+        with conn:
+            for operation, params in items:
+                if operation == "put":
+                    conn.execute(
+                        """INSERT INTO translations (key, translation, model, tokens, created_at, last_used)
+                           VALUES (?, ?, ?, ?, ?, ?)
+                           ON CONFLICT(key) DO UPDATE SET translation = excluded.translation, last_used = excluded.last_used""",
+                        params
+                    )
+                    keys.append((params[0], params[1]))
+                else:
+                    conn.execute("UPDATE translations SET last_used = ?, hits = hits + 1 WHERE key = ?", params)
+        with self._lock:
+            for key, translation in keys:
+                # 提交期间同一键可能又被更新，只移除已写入的版本
+                if self._pending.get(key, (None,))[0] == translation:
+                    del self._pending[key]
+
+    def flush(self):
+        """等待已提交的写入全部写入数据库后停止后台线程"""
+        self._writer.close()
+
+    def evict(self):
+        """删除超过保存天数的条目，并按最近使用时间只保留max_entries条，返回删除条数"""
+        with self._lock:
+            deleted = 0
+            if self.max_age_days > 0:
+                cutoff = time.time() - self.max_age_days * 86400
+                deleted += self._conn.execute(
+                    "DELETE FROM translations WHERE last_used < ?", (cutoff,)
+                ).rowcount
+            if self.max_entries > 0:
+                deleted += self._conn.execute(
+                    """DELETE FROM translations WHERE key IN (
+                        SELECT key FROM translations ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                    )""", (self.max_entries,)
+                ).rowcount
+            self._conn.commit()
+            return deleted
+
+    @property
+    def hit_rate(self):
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    def close(self):
+        self.flush()
+        self.evict()
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,1250 @@
+import os
+import asyncio
+import functools
+import hashlib
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from cache_stream import CacheStreamWriter
+from cancellation import CancellationToken
+from context_window import ContextWindow, get_context_window_size
+from glossary import filter_glossary, format_glossary, load_glossary
+from job_journal import JobJournal, make_job_id
+from log_pipeline import DEBUG, INFO, WARNING, ERROR, JsonlLogSink
+from markdown_parser import KIND_NAMES, TRANSLATABLE_KINDS, iter_blocks, iter_chapters
+from metrics import MetricsRegistry
+from passthrough import classify
+from progress import ProgressBus
+from planner import MODEL_PRICES, PlanEstimate, estimate_cost
+from packing import build_user_message, pack_paragraphs, split_packed_response, split_paragraph
+from request_engine import Reply, ReplyTruncated, RequestEngine
+from scheduler import FilePipeline, WorkQueue
+from token_utils import CHARS_PER_TOKEN, estimate_tokens
+from translation_memory import TranslationMemory
+
+# 各API提供商可选的模型
+PROVIDER_MODELS = {
+    "硅基流动": [
+        "Qwen/QwQ-32B",
+        "Pro/deepseek-ai/DeepSeek-R1",
+        "Pro/deepseek-ai/DeepSeek-V3",
+        "deepseek-ai/DeepSeek-R1",
+        "deepseek-ai/DeepSeek-V3",
+        "deepseek-ai/DeepSeek-R1-Distill-Qwen-32B",
+        "deepseek-ai/DeepSeek-R1-Distill-Qwen-14B",
+        "deepseek-ai/DeepSeek-R1-Distill-Qwen-7B",
+        "deepseek-ai/DeepSeek-R1-Distill-Qwen-1.5B",
+        "Pro/deepseek-ai/DeepSeek-R1-Distill-Qwen-7B",
+        "Pro/deepseek-ai/DeepSeek-R1-Distill-Qwen-1.5B",
+        "deepseek-ai/DeepSeek-V2.5",
+        "Qwen/Qwen2.5-72B-Instruct-128K",
+        "Qwen/Qwen2.5-72B-Instruct",
+        "Qwen/Qwen2.5-32B-Instruct",
+        "Qwen/Qwen2.5-14B-Instruct",
+        "Qwen/Qwen2.5-7B-Instruct",
+        "Qwen/Qwen2.5-Coder-32B-Instruct",
+        "Qwen/Qwen2.5-Coder-7B-Instruct",
+        "Qwen/Qwen2-7B-Instruct",
+        "Qwen/Qwen2-1.5B-Instruct",
+        "Qwen/QwQ-32B-Preview",
+        "TeleAI/TeleChat2",
+        "THUDM/glm-4-9b-chat",
+        "Vendor-A/Qwen/Qwen2.5-72B-Instruct",
+        "internlm/internlm2_5-7b-chat",
+        "internlm/internlm2_5-20b-chat",
+        "Pro/Qwen/Qwen2.5-7B-Instruct",
+        "Pro/Qwen/Qwen2-7B-Instruct",
+        "Pro/Qwen/Qwen2-1.5B-Instruct",
+        "Pro/THUDM/chatglm3-6b",
+        "Pro/THUDM/glm-4-9b-chat"
+    ],
+    "Deepseek": [
+        "deepseek-chat",
+        "deepseek-reasoner"
+    ]
+}
+
+# 各API提供商的默认模型
+DEFAULT_MODELS = {
+    "硅基流动": "deepseek-ai/DeepSeek-R1",
+    "Deepseek": "deepseek-chat"
+}
+
+# 遇到以下标题（不区分大小写）时截断后续内容
+CUTOFF_TITLES = (
+    "# references",
+    "# acknowledgements",
+    "# acknowledgement",
+    "# acknowledgment",
+    "# bibliography"
+)
+
+# 翻译指令作为系统提示词，所有章节、所有文件完全相同，便于命中服务端的前缀缓存
+SYSTEM_PROMPT = "请将经济学论文英译中，要求：1. 严格忠实原文，不增删内容；2. 保留Markdown代码；3. 润色语言流畅度，用词通顺易懂，表达清晰，切合中文表达习惯；4.仅输出翻译结果（使用中文标点），不要输出任何其他内容，不要输出任何对翻译结果的说明。"
+
+# 并行翻译的章节片段以前文的原文代替前文的译文保持连贯
+SOURCE_CONTEXT_TEMPLATE = "以下是待翻译内容之前的原文，仅供理解上下文，不要翻译：\n{}"
+SOURCE_CONTEXT_MAX_TOKENS = 1000
+# 开启长章节拆分时每个片段的默认最少原文token数
+DEFAULT_SEGMENT_MIN_TOKENS = 2000
+
+
+@dataclass
+class TranslationConfig:
+    """翻译任务参数，GUI与命令行共用"""
+    api_provider: str = "Deepseek"
+    api_key: str = ""
+    model: str = "deepseek-chat"
+    temperature: float = 0.7
+    max_tokens: int = 1024
+    parallel_count: int = 3  # 整个任务同时在途的最大请求数
+    result_path: str = "TranslateResult"
+    cache_path: str = "cache"
+    pool_max_connections: int = 100  # 每个提供商的最大连接数
+    pool_max_keepalive: int = 20  # 每个提供商保持的空闲长连接数
+    pool_keepalive_expiry: float = 30.0  # 空闲长连接的保持时间（秒）
+    http2: bool = True  # 安装了h2时使用HTTP/2多路复用
+    requests_per_minute: int = 0  # 每个提供商和API Key每分钟最大请求数，0表示不限制
+    tokens_per_minute: int = 0  # 每个提供商和API Key每分钟最大token数，0表示不限制
+    max_retries: int = 5  # 请求失败（429、5xx、网络错误）后的最大重试次数
+    backoff_base: float = 1.0  # 指数退避的初始等待时间（秒）
+    backoff_max: float = 60.0  # 指数退避的最长等待时间（秒）
+    pack_paragraphs: bool = False  # 将连续的短段落合并为一个请求
+    pack_token_budget: int = 800  # 每个合并请求的原文token预算
+    pack_max_paragraphs: int = 20  # 每个合并请求最多包含的段落数
+    context_turns: int = 0  # 上下文保留的最近对话轮数，0表示使用模型默认值
+    context_tokens: int = 0  # 上下文历史对话的token上限，0表示使用模型默认值
+    use_translation_memory: bool = True  # 复用以前翻译过的相同段落
+    translation_memory_path: str = "translation_memory.db"  # 翻译记忆库文件
+    memory_max_entries: int = 200000  # 翻译记忆库最多保存的条目数
+    memory_max_age_days: int = 180  # 翻译记忆库条目的最长保存天数
+    max_active_files: int = 4  # 流水线中同时处理的最大文件数，0表示不限制
+    stream: bool = True  # 使用流式响应，译文边生成边写入缓存
+    stream_idle_timeout: float = 60.0  # 流式响应两段数据之间的最长等待时间（秒），超过则中止重试
+    connect_timeout: float = 10.0  # 建立连接的超时（秒），0表示不限制
+    read_timeout: float = 300.0  # 两次收到数据之间的最长等待时间（秒），0表示不限制
+    request_timeout: float = 900.0  # 单次请求从发出到收完回复的总超时（秒），超时后按网络错误重试，0表示不限制
+    paragraph_deadline: float = 0.0  # 每段（或每个合并请求）包括重试在内的最长翻译时间（秒），超过则记为失败，0表示不限制
+    job_deadline: float = 0.0  # 每个文件从该文件开始翻译起的最长时间（秒），超过后未完成的段落记为失败，0表示不限制
+    task_deadline: float = 0.0  # 整个任务（队列中所有文件）从开始起的最长时间（秒），超过后未完成的段落记为失败，0表示不限制
+    segment_min_tokens: int = 0  # 长章节拆分为并行片段时每段的最少原文token数，0表示不拆分（默认不拆分）
+    segment_max_tokens: int = 0  # 每个片段的最大原文token数，大于0时章节按此拆分，0表示按总工作量除以并发数自动确定
+    source_context_paragraphs: int = 3  # 拆分出的片段开头附带的前文原文段落数
+    glossary_path: str = ""  # 术语表文件，每行“原文=译文”或以制表符分隔，为空时不使用
+    extra_routes: list = field(default_factory=list)  # 备用线路，每项为“提供商:模型[:API Key]”，省略Key时使用api_key
+    hedge_requests: bool = False  # 请求耗时超过滚动分位数时发送相同的对冲请求，取先完成的结果
+    hedge_percentile: float = 95.0  # 发起对冲的耗时分位数（按提供商和模型统计最近的请求）
+    hedge_min_delay: float = 2.0  # 发起对冲前至少等待的秒数
+    hedge_max_ratio: float = 0.1  # 对冲请求数占总请求数的上限
+    passthrough_filter: bool = True  # 纯图片、公式、网址、数字等无需翻译的段落原样保留，不调用API
+    log_file: str = ""  # 完整日志（含段落原文和译文）以JSON行格式写入的文件，为空时不写入
+    metrics_path: str = ""  # 请求指标导出文件，扩展名为.prom时为Prometheus文本格式，否则为JSON，为空时不导出
+
+
+class EngineListener:
+    """翻译引擎事件回调，默认将不低于log_level的日志输出到控制台，其余事件忽略
+
+    段落进度和流式接收进度频率很高，不通过回调通知，而是发布到引擎的progress，由调用方定时取出快照。
+    """
+
+    log_level = INFO
+
+    def __init__(self, log_level=INFO):
+        self.log_level = log_level
+
+    def log_message(self, message, level):
+        if level >= self.log_level:
+            self.log(message)
+
+    def log(self, message):
+        print(message, flush=True)
+
+    def on_file_start(self, file_index, file_path):
+        pass
+
+    def on_file_parsed(self, file_path, batches):
+        pass
+
+    def on_file_status(self, file_path, status):
+        pass
+
+
+class FileJob:
+    """单个文件的翻译状态"""
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.filtered_batches = []
+        self.total_paragraphs = 0
+        self.completed_paragraphs = 0
+        self.translation_results = {}
+        self.merged_file_path = None
+        self.source_hash = None
+        self.job_id = None  # 由原文内容和翻译设置决定的稳定ID，用于断点续传
+        self.journal = None
+        self.passthrough_paragraphs = 0  # 内容无需翻译而原样保留的段落数
+        self.paragraph_counts = {}  # 各来源（translated、reused、passthrough、failed）的段落数
+        self.segments = []  # 工作单元，长章节拆分为多个片段
+        self.chapter_completed = {}  # 各章节已完成的段落数
+        self.started_at = None  # 开始翻译的时间（time.monotonic）
+        self.deadline = None  # 文件的截止时间（cancel_token.clock()，暂停期间不消耗），None表示不限制
+        self.glossary_prompt = ""  # 本文件用到的术语
+        self.request_units = 0  # 实际发出的翻译请求单元数（合并请求计为1）
+        self.context_tokens_sent = 0  # 估算的已发送输入token数
+        self.context_tokens_saved = 0  # 滑动窗口相比发送完整历史节省的输入token数
+
+
+class ChapterSegment:
+    """调度的工作单元：一个章节，或长章节拆分出的一段连续块"""
+
+    def __init__(self, chapter_index, part_index, title, blocks, first_number, cost, source_context=None):
+        self.chapter_index = chapter_index
+        self.part_index = part_index  # 从1开始
+        self.title = title
+        self.blocks = blocks
+        self.first_number = first_number  # 第一个块在章节内的段落编号
+        self.cost = cost  # 预估的原文token数，决定调度顺序
+        self.source_context = source_context or []  # 片段之前的原文段落，用于保持连贯
+
+    @property
+    def cache_filename_suffix(self):
+        return f"chapter_{self.chapter_index}" if self.part_index == 1 else f"chapter_{self.chapter_index}_part_{self.part_index}"
+
+
+class TranslationEngine:
+    """不依赖界面的翻译引擎：过滤、分章节并行翻译、合并结果"""
+
+    def __init__(self, config, listener=None):
+        self.config = config
+        self.listener = listener or EngineListener()
+        self.should_stop = False
+        self.task_deadline = None  # 整个任务的截止时间（cancel_token.clock()），None表示不限制
+        self._progress_lock = threading.Lock()
+        self.log_sink = None
+        self.progress = ProgressBus()
+        self.metrics = MetricsRegistry()
+        self.cancel_token = CancellationToken()
+        self.request_engine = RequestEngine(config, self.log, self.metrics, self.cancel_token)
+        self.translation_memory = None
+        self.glossary = []
+        # 翻译记忆和任务ID所用的提示词，包含完整术语表，术语表变化后不复用旧译文
+        self.prompt_key = SYSTEM_PROMPT
+        self._load_glossary()
+
+    def log(self, message, level=INFO):
+        if self.log_sink is not None:
+            self.log_sink.write(level, message)
+        self.listener.log_message(message, level)
+
+    def _load_glossary(self):
+        """读取配置的术语表"""
+        if not self.config.glossary_path:
+            return
+        try:
+            self.glossary = load_glossary(self.config.glossary_path)
+        except Exception as e:
+            self.log(f"术语表读取失败，将不使用术语表: {str(e)}", WARNING)
+            return
+        if self.glossary:
+            self.prompt_key = SYSTEM_PROMPT + "\n" + format_glossary(self.glossary)
+        self.log(f"已加载术语表: {len(self.glossary)} 个术语")
+
+    def stop(self):
+        """停止翻译：中止正在进行的请求，排队中的工作单元不再开始，可在任意线程中调用"""
+        self.should_stop = True
+        self.cancel_token.cancel()
+
+    def pause(self):
+        """暂停翻译：不再发出新请求，已发出的请求继续完成，可在任意线程中调用"""
+        self.cancel_token.pause()
+
+    def resume(self):
+        """从暂停处继续翻译"""
+        self.cancel_token.resume()
+
+    @property
+    def is_paused(self):
+        return self.cancel_token.paused
+
+    def filter_file_content(self, file_path):
+        """流式解析Markdown文件，按标题拆分为章节，返回FileJob
+
+        每个章节是MarkdownBlock列表，代码、公式、图片等块不发送给模型，翻译时原样保留。
+        """
+        job = FileJob(file_path)
+        hasher = hashlib.sha256()
+        line_counts = {"original": 0, "blank": 0}
+
+        def read_lines(f):
+            # 逐行读取，同时计算原文哈希和行数
+            for line in f:
+                hasher.update(line.encode('utf-8'))
+                line_counts["original"] += 1
+                if not line.strip():
+                    line_counts["blank"] += 1
+                yield line
+
+        # 单个块的原文不超过max_tokens的一半（与合并请求的预算相同），避免译文达到max_tokens被截断
+        max_block_chars = int(self.config.max_tokens) // 2 * CHARS_PER_TOKEN
+        with open(file_path, 'r', encoding='utf-8') as f:
+            batches = list(iter_chapters(iter_blocks(read_lines(f), max_block_chars), CUTOFF_TITLES))
+        job.source_hash = hasher.hexdigest()
+        original_lines = line_counts["original"]
+
+        total_chapters = len(batches)
+
+        # 计算总段落数（不包括标题），代码、公式等原样保留的块也计入
+        total_paragraphs = sum(len(batch_lines) for _, batch_lines in batches)
+        kind_counts = {}
+        for _, batch_lines in batches:
+            for block in batch_lines:
+                kind_counts[block.kind] = kind_counts.get(block.kind, 0) + 1
+        translatable_count = sum(kind_counts.get(kind, 0) for kind in TRANSLATABLE_KINDS)
+
+        # 显示解析结果
+        self.log(f"\n{'='*60}")
+        self.log("文件处理情况:")
+        self.log(f"{'─'*30}")
+        self.log(f"原始行数: {original_lines}")
+        self.log(f"空行数: {line_counts['blank']}")
+        self.log("块类型: " + "，".join(f"{KIND_NAMES[kind]} {count}" for kind, count in kind_counts.items()))
+        self.log(f"需翻译块数: {translatable_count}，原样保留块数: {total_paragraphs - translatable_count}")
+        self.log(f"{'─'*30}")
+
+        self.log(f"\n{'='*60}")
+        self.log("章节信息:")
+        self.log(f"{'─'*30}")
+        self.log(f"总章节数: {total_chapters}")
+        self.log(f"总段落数: {total_paragraphs}")
+        self.log(f"{'─'*30}")
+
+        # 显示各章节信息
+        for i, (title, batch_lines) in enumerate(batches):
+            self.log(f"第 {i+1} 章: {title}")
+            self.log(f"段落数: {len(batch_lines)}")
+
+        job.filtered_batches = batches
+        job.total_paragraphs = total_paragraphs
+        return job
+
+    async def chat_completion(self, messages, stream_sink=None, deadline=None, job=None):
+        """通过请求层调用API，受整个任务共享的并发上限约束，超过deadline（cancel_token.clock()）时返回None
+
+        给出job时计入该文件实际发出的翻译请求数（请求层的重试不另计）。
+        """
+        if job is not None:
+            job.request_units += 1
+        try:
+            return await self.request_engine.chat_completion(messages, stream_sink, deadline)
+        finally:
+            if stream_sink is not None:
+                stream_sink.finish()
+
+    def _deadline(self, job):
+        """当前段落的截止时间：段落、文件和整个任务的截止时间中最早的一个，都不限制时返回None
+
+        截止时间按cancel_token.clock()计算，暂停期间不消耗，继续后不会因暂停而失败。
+        """
+        deadlines = [deadline for deadline in (job.deadline, self.task_deadline) if deadline is not None]
+        paragraph_deadline = float(self.config.paragraph_deadline)
+        if paragraph_deadline > 0:
+            deadlines.append(self.cancel_token.clock() + paragraph_deadline)
+        return min(deadlines) if deadlines else None
+
+    def _deadline_passed(self, deadline):
+        return deadline is not None and self.cancel_token.clock() >= deadline
+
+    def _count_paragraph(self, job, source):
+        """按来源累计段落数：文件内的计数记在FileJob中，导出的指标不带文件标签，避免每个文件新增一组序列"""
+        job.paragraph_counts[source] = job.paragraph_counts.get(source, 0) + 1
+        self.metrics.inc("paragraphs_total", source=source)
+
+    def _add_completed_paragraph(self, job, chapter_index):
+        """线程安全地累加已完成段落数并发布章节进度和总进度"""
+        with self._progress_lock:
+            job.completed_paragraphs += 1
+            completed = job.completed_paragraphs
+            chapter_completed = job.chapter_completed.get(chapter_index, 0) + 1
+            job.chapter_completed[chapter_index] = chapter_completed
+        chapter_total = len(job.filtered_batches[chapter_index - 1][1])
+        self.progress.publish_paragraph(job.file_path, chapter_index, chapter_completed, chapter_total,
+                                        completed, job.total_paragraphs)
+
+    def _split_units(self, paragraphs):
+        """将段落分为请求单元：开启合并请求时按token预算分组，否则每段一个请求"""
+        if not self.config.pack_paragraphs:
+            return [[paragraph] for paragraph in paragraphs]
+        # 中文译文的token数通常多于英文原文，预算不超过最大输出token的一半
+        token_budget = min(int(self.config.pack_token_budget), int(self.config.max_tokens) // 2)
+        return pack_paragraphs(paragraphs, max(1, token_budget), int(self.config.pack_max_paragraphs))
+
+    def _plan_units(self, job, chapter_index, blocks, first_number=1):
+        """查询任务日志和翻译记忆后划分请求单元，返回[(段落列表, 已有译文列表或None, 原样保留的块类型或None)]
+
+        不需要翻译的块和已有译文的段落各自单独成为一个单元，其余连续段落再按合并设置分组。
+        """
+        units = []
+        pending = []
+        for paragraph_number, block in enumerate(blocks, first_number):
+            paragraph = block.text
+            if not block.translatable:
+                units.extend((unit, None, None) for unit in self._split_units(pending))
+                pending = []
+                units.append(([paragraph], [paragraph], block.passthrough_reason))
+                continue
+            translation = None
+            if job.journal is not None:
+                translation = job.journal.get(chapter_index, paragraph_number, paragraph)
+            if translation is None:
+                translation = self._recall(paragraph)
+            if translation is None:
+                pending.append(paragraph)
+                continue
+            units.extend((unit, None, None) for unit in self._split_units(pending))
+            pending = []
+            units.append(([paragraph], [translation], None))
+        units.extend((unit, None, None) for unit in self._split_units(pending))
+        return units
+
+    def _recall(self, paragraph):
+        """从翻译记忆中查询段落译文"""
+        if self.translation_memory is None:
+            return None
+        return self.translation_memory.get(
+            paragraph, self.config.model, self.prompt_key, self.config.temperature)
+
+    def _remember(self, paragraph, translation, model):
+        """将段落译文以实际给出译文的模型存入翻译记忆，由备用线路翻译的段落不会被当作主线路模型的译文复用"""
+        if self.translation_memory is None or model is None:
+            return
+        self.translation_memory.put(
+            paragraph, model, self.prompt_key, self.config.temperature, translation)
+
+    def _create_context_window(self, job, segment):
+        """按模型和配置创建工作单元的滑动窗口上下文
+
+        固定消息依次为：系统提示词（所有请求相同）、本文件用到的术语、片段之前的原文，
+        越靠前的消息越稳定，便于命中前缀缓存。
+        """
+        max_turns, max_tokens = get_context_window_size(
+            self.config.model, int(self.config.context_turns), int(self.config.context_tokens))
+        context = ContextWindow(max_turns, max_tokens)
+        context.add_head({"role": "system", "content": SYSTEM_PROMPT})
+        if job.glossary_prompt:
+            context.add_head({"role": "system", "content": job.glossary_prompt})
+        if segment.source_context:
+            context.add_head({"role": "system", "content": SOURCE_CONTEXT_TEMPLATE.format("\n\n".join(segment.source_context))})
+        return context
+
+    async def _translate_paragraph(self, context, paragraph, chapter_index, paragraph_number, stream_sink=None, deadline=None, job=None):
+        """逐段翻译，成功后将对话记入上下文窗口，返回译文或None
+
+        请求失败后的重试、换线路和退避都在请求层完成，请求层返回None时直接放弃；
+        这里只在模型返回空译文时重新请求，最多共请求3次，共用同一个截止时间deadline。
+        译文达到max_tokens被截断时将段落切成两半分别翻译，截断的译文不写入翻译记忆和任务日志。
+        """
+        user_input = build_user_message([paragraph])
+        max_attempts = 3
+        for attempt in range(max_attempts):
+            if self.should_stop:
+                return None
+            if self._deadline_passed(deadline):
+                return None
+            try:
+                self.log(f"\n原文:\n{'─'*30}\n{user_input}\n{'─'*30}", DEBUG)
+                self.log("思考中...", DEBUG)
+                response = await self.chat_completion(context.build(user_input), stream_sink, deadline, job)
+            except ReplyTruncated:
+                return await self._translate_halves(context, paragraph, chapter_index, paragraph_number, stream_sink, deadline, job)
+            except Exception as e:
+                self.log(f"警告: 第 {chapter_index} 章的第 {paragraph_number} 段翻译出错: {str(e)}", WARNING)
+                return None
+
+            if response is None:
+                # 请求层已经重试过，或者已停止、超过截止时间
+                return None
+            if response.strip():
+                context.add_turn(user_input, response)
+                self._remember(paragraph, response, response.model)
+
+                self.log(f"\n译文:\n{'─'*30}\n{response}\n{'─'*30}", DEBUG)
+                return response
+
+            if attempt + 1 < max_attempts:
+                self.log(f"警告: 第 {chapter_index} 章的第 {paragraph_number} 段返回了空译文，正在进行第 {attempt + 2} 次请求...", WARNING)
+            else:
+                self.log(f"警告: 第 {chapter_index} 章的第 {paragraph_number} 段返回了空译文，已达到最大请求次数", WARNING)
+        return None
+
+    async def _translate_halves(self, context, paragraph, chapter_index, paragraph_number, stream_sink=None, deadline=None, job=None):
+        """段落的译文达到max_tokens被截断时，将段落切成两半分别翻译再拼接，返回译文或None"""
+        parts = split_paragraph(paragraph)
+        if parts is None:
+            self.log(f"警告: 第 {chapter_index} 章的第 {paragraph_number} 段译文达到max_tokens上限被截断，且无法再拆分", WARNING)
+            return None
+        first, second, separator = parts
+        self.log(f"第 {chapter_index} 章的第 {paragraph_number} 段译文达到max_tokens上限被截断，拆成两部分重新翻译", WARNING)
+        translations = []
+        for part in (first, second):
+            translation = await self._translate_paragraph(context, part, chapter_index, paragraph_number, stream_sink, deadline, job)
+            if translation is None:
+                return None
+            translations.append(translation)
+        # 两半由不同模型翻译时不存入翻译记忆
+        models = {translation.model for translation in translations}
+        response = Reply(separator.join(translations), models.pop() if len(models) == 1 else None)
+        self._remember(paragraph, response, response.model)
+        return response
+
+    async def _translate_packed(self, context, paragraphs, chapter_index, first_number, stream_sink=None, deadline=None, job=None):
+        """将多段合并为一个请求翻译，返回(各段译文, 是否拆分失败)
+
+        回复能按编号拆分时返回(译文列表, False)；请求失败（请求层已重试过，或已停止、超过截止时间）时返回(None, False)，
+        这些段落不再单独请求；回复不能按编号拆分或达到max_tokens被截断时返回(None, True)，由调用方改为逐段翻译。
+        """
+        user_input = build_user_message(paragraphs)
+
+        self.log(f"\n原文（第 {first_number}-{first_number + len(paragraphs) - 1} 段合并请求）:\n{'─'*30}\n{user_input}\n{'─'*30}", DEBUG)
+        self.log("思考中...", DEBUG)
+        try:
+            response = await self.chat_completion(context.build(user_input), stream_sink, deadline, job)
+        except ReplyTruncated:
+            self.log(f"第 {chapter_index} 章第 {first_number}-{first_number + len(paragraphs) - 1} 段合并翻译达到max_tokens上限被截断")
+            return None, True
+        if response is None:
+            return None, False
+
+        translations = split_packed_response(response, len(paragraphs))
+        if translations is None:
+            return None, True
+
+        context.add_turn(user_input, response)
+        translations = [Reply(translation, response.model) for translation in translations]
+        for paragraph, translation in zip(paragraphs, translations):
+            self._remember(paragraph, translation, response.model)
+
+        self.log(f"\n译文:\n{'─'*30}\n{response}\n{'─'*30}", DEBUG)
+        return translations, False
+
+    async def translate_segment(self, job, segment):
+        """翻译一个工作单元（整个章节或长章节的一个片段）"""
+        chapter_index = segment.chapter_index
+        title = segment.title
+        try:
+            # 开始翻译
+            context = self._create_context_window(job, segment)
+            cache_file = None
+
+            self.log(f"\n{'='*60}")
+            if segment.part_index == 1:
+                self.log(f"开始处理第 {chapter_index} 章: {title}")
+            else:
+                self.log(f"开始处理第 {chapter_index} 章第 {segment.part_index} 部分: {title}")
+            self.log(f"{'='*60}")
+
+            # 创建缓存文件，文件名使用稳定的任务ID，断点恢复时覆盖重写
+            filename = f"conversation_{job.job_id}_{segment.cache_filename_suffix}.md"
+            cache_file = os.path.join(self.config.cache_path, filename)
+
+            # 确保缓存目录存在
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+
+            # 写入标题，拆分出的后续片段不重复写标题
+            with open(cache_file, 'w', encoding='utf-8') as f:
+                if title and segment.part_index == 1:
+                    f.write(f"{title}\n\n")
+
+            # 流式模式下译文边生成边写入缓存文件，并通知接收进度
+            stream_sink = None
+            if self.config.stream:
+                stream_sink = CacheStreamWriter(
+                    cache_file,
+                    lambda received_chars, reasoning_chars: self.progress.publish_stream(
+                        job.file_path, chapter_index, received_chars, reasoning_chars)
+                )
+
+            paragraph_number = segment.first_number - 1  # 已处理（成功或失败）的段落在章节内的编号
+
+            # 翻译片段内的段落，开启合并请求时连续的短段落合并为一个请求
+            for unit, translations, passthrough_reason in self._plan_units(job, chapter_index, segment.blocks, segment.first_number):
+                if self.should_stop:
+                    break
+
+                if passthrough_reason is not None:
+                    # 代码、公式、图片等块不发送给模型，原样写入
+                    paragraph_number += 1
+                    self.log(f"第 {chapter_index} 章第 {paragraph_number} 段为{passthrough_reason}，原样保留")
+                    with open(cache_file, 'a', encoding='utf-8') as f:
+                        f.write(f"{unit[0]}\n\n")
+                    self._add_completed_paragraph(job, chapter_index)
+                    self._count_paragraph(job, "passthrough")
+                    continue
+
+                source = "reused" if translations is not None else "translated"
+                if translations is not None:
+                    # 断点恢复或命中翻译记忆，不发送请求，但仍记入上下文以保持连贯
+                    for paragraph, translation in zip(unit, translations):
+                        context.add_turn(build_user_message([paragraph]), translation)
+                    self.log(f"第 {chapter_index} 章第 {paragraph_number + 1} 段使用已有译文", DEBUG)
+                elif len(unit) > 1:
+                    translations, split_failed = await self._translate_packed(
+                        context, unit, chapter_index, paragraph_number + 1, stream_sink, self._deadline(job), job)
+                    if split_failed:
+                        self.log(f"警告: 第 {chapter_index} 章第 {paragraph_number + 1}-{paragraph_number + len(unit)} 段合并翻译的回复无法按段拆分，改为逐段翻译", WARNING)
+                    elif translations is None:
+                        # 请求本身失败，逐段重新请求也不会成功，这些段落记为失败
+                        translations = [None] * len(unit)
+                if translations is None:
+                    translations = []
+                    for i, paragraph in enumerate(unit):
+                        if self.should_stop:
+                            break
+                        translations.append(await self._translate_paragraph(
+                            context, paragraph, chapter_index, paragraph_number + i + 1, stream_sink, self._deadline(job), job))
+
+                for paragraph, response in zip(unit, translations):
+                    if not response and self.should_stop:
+                        # 停止时被中止的段落不算作失败，重新运行时从任务日志继续
+                        break
+                    paragraph_number += 1
+                    if response:
+                        # 记录到任务日志，中断后重新运行时跳过该段
+                        if job.journal is not None:
+                            # 来自任务日志或翻译记忆的译文不是Reply，按主线路的模型记录
+                            job.journal.record(chapter_index, paragraph_number, paragraph, response,
+                                               getattr(response, "model", self.config.model))
+
+                        # 立即写入文件
+                        if cache_file:
+                            with open(cache_file, 'a', encoding='utf-8') as f:
+                                f.write(f"{response}\n\n")
+
+                        # 更新章节进度和总进度
+                        self._add_completed_paragraph(job, chapter_index)
+                        self._count_paragraph(job, source)
+                    else:
+                        self.log(f"警告: 第 {chapter_index} 章的第 {paragraph_number} 段翻译最终失败，将继续处理下一段", WARNING)
+                        self._count_paragraph(job, "failed")
+                        if cache_file:
+                            with open(cache_file, 'a', encoding='utf-8') as f:
+                                f.write("【翻译失败】\n\n")
+
+            job.context_tokens_sent += context.tokens_sent
+            job.context_tokens_saved += context.tokens_saved
+
+            # 记录缓存文件路径，章节的各片段按顺序合并
+            result = job.translation_results.setdefault(chapter_index, {'title': title, 'parts': {}})
+            result['parts'][segment.part_index] = os.path.basename(cache_file)
+
+            return True
+        except Exception as e:
+            self.log(f"第 {chapter_index} 章翻译出错: {str(e)}", ERROR)
+            return False
+
+    def _prepare_glossary(self, job):
+        """挑出文件中出现过的术语，术语表只发送这一部分"""
+        if not self.glossary:
+            return
+        texts = [block.text for _, blocks in job.filtered_batches for block in blocks if block.translatable]
+        entries = filter_glossary(self.glossary, texts)
+        job.glossary_prompt = format_glossary(entries)
+        self.log(f"术语表: 本文件用到 {len(entries)} 个术语")
+
+    def _source_context(self, blocks):
+        """取片段之前最近的几段原文，总长度不超过SOURCE_CONTEXT_MAX_TOKENS"""
+        count = int(self.config.source_context_paragraphs)
+        if count <= 0:
+            return []
+        paragraphs = [block.text for block in blocks if block.translatable][-count:]
+        while paragraphs and sum(estimate_tokens(p) for p in paragraphs) > SOURCE_CONTEXT_MAX_TOKENS:
+            paragraphs.pop(0)
+        return paragraphs
+
+    def plan_segments(self, job):
+        """将文件的章节划分为工作单元：超过单元上限的长章节在块边界处拆分为多个片段并行翻译
+
+        单元上限取文件的总工作量除以并发数，且不小于segment_min_tokens，
+        使总耗时接近总工作量除以并发数，而不是取决于最长的章节；设置了segment_max_tokens时直接使用该值。
+        拆分出的片段不依赖前一片段的译文，而是附带前文的原文，因此同一章节的片段可以同时翻译。
+        """
+        chapter_costs = [
+            [estimate_tokens(block.text) if block.translatable else 0 for block in blocks]
+            for _, blocks in job.filtered_batches
+        ]
+        min_tokens = int(self.config.segment_min_tokens)
+        workers = self.request_engine.max_concurrency
+        total_cost = sum(sum(costs) for costs in chapter_costs)
+        max_cost = max(min_tokens, (total_cost + workers - 1) // workers) if min_tokens > 0 else 0
+        if int(self.config.segment_max_tokens) > 0:
+            max_cost = int(self.config.segment_max_tokens)
+
+        segments = []
+        for chapter_index, ((title, blocks), costs) in enumerate(zip(job.filtered_batches, chapter_costs), 1):
+            part_index = 1
+            start = 0
+            cost = 0
+            for i, block_cost in enumerate(costs):
+                if max_cost and cost and cost + block_cost > max_cost:
+                    segments.append(ChapterSegment(chapter_index, part_index, title, blocks[start:i], start + 1, cost,
+                                                   self._source_context(blocks[:start])))
+                    part_index += 1
+                    start = i
+                    cost = 0
+                cost += block_cost
+            segments.append(ChapterSegment(chapter_index, part_index, title, blocks[start:], start + 1, cost,
+                                           self._source_context(blocks[:start])))
+        job.segments = segments
+        return segments
+
+    def merge_translation_results(self, job):
+        """合并所有章节的翻译结果，返回合并文件路径"""
+        # 按章节顺序合并内容
+        merged_content = []
+
+        # 检查是否有遗漏的章节
+        expected_chapters = len(job.filtered_batches)
+        translated_chapters = len(job.translation_results)
+
+        if translated_chapters < expected_chapters:
+            self.log(f"\n{'='*60}")
+            self.log("警告: 部分章节未被翻译", WARNING)
+            self.log(f"{'─'*30}")
+            self.log(f"总章节数: {expected_chapters}")
+            self.log(f"已翻译章节数: {translated_chapters}")
+            self.log(f"遗漏章节数: {expected_chapters - translated_chapters}")
+            self.log(f"{'─'*30}")
+
+        # 按章节顺序合并内容
+        for chapter_index in range(1, expected_chapters + 1):
+            result = job.translation_results.get(chapter_index)
+            if result and result['parts']:
+                title = result['title']
+                # 添加章节标题
+                if title:
+                    merged_content.append(title)
+                    merged_content.append('')  # 标题后添加空行
+
+                # 按顺序从各片段的缓存文件读取翻译内容
+                part_count = sum(1 for segment in job.segments if segment.chapter_index == chapter_index)
+                for part_index in range(1, max(part_count, 1) + 1):
+                    filename = result['parts'].get(part_index)
+                    cache_file = os.path.join(self.config.cache_path, filename) if filename else None
+                    if cache_file is None or not os.path.exists(cache_file):
+                        merged_content.append(f"【注意：此章节第 {part_index} 部分未被翻译】")
+                        merged_content.append('')
+                        continue
+                    with open(cache_file, 'r', encoding='utf-8') as f:
+                        content = f.read()
+                        # 跳过缓存文件开头的章节标题
+                        lines = content.split('\n')
+                        start_index = 1 if part_index == 1 and title and lines and lines[0].strip() == title.strip() else 0
+                        # 添加翻译内容
+                        merged_content.extend(lines[start_index:])
+            else:
+                # 对于未翻译的章节，添加原始标题和提示
+                title = job.filtered_batches[chapter_index - 1][0]
+                if title:
+                    merged_content.append(title)
+                    merged_content.append('')  # 标题后添加空行
+                merged_content.append("【注意：此章节未被翻译】")
+                merged_content.append('')  # 提示后添加空行
+
+            # 章节之间添加额外的空行
+            merged_content.append('')
+
+        # 确保结果目录存在
+        result_dir = self.config.result_path
+        os.makedirs(result_dir, exist_ok=True)
+
+        # 保存合并后的文件，文件名中带上原文件名；不同目录下的同名文件可能在同一秒完成，
+        # 文件名已存在时加上序号，不覆盖已有结果
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        source_name = os.path.splitext(os.path.basename(job.file_path))[0]
+        merged_name = f"translation_{timestamp}_{source_name}_merged"
+        merged_file_path = os.path.join(result_dir, f"{merged_name}.md")
+        sequence = 1
+        while True:
+            try:
+                f = open(merged_file_path, 'x', encoding='utf-8')
+                break
+            except FileExistsError:
+                sequence += 1
+                merged_file_path = os.path.join(result_dir, f"{merged_name}_{sequence}.md")
+        with f:
+            f.write('\n'.join(merged_content))
+
+        self.log(f"\n{'='*60}")
+        self.log("文件处理完成:")
+        self.log(f"{'─'*30}")
+        self.log(f"合并后的翻译结果已保存到: {merged_file_path}")
+
+        job.merged_file_path = merged_file_path
+        return merged_file_path
+
+    def prepare_file(self, file_path, file_index=0):
+        """解析文件并打开任务日志，返回待翻译的FileJob"""
+        self.listener.on_file_start(file_index, file_path)
+        self.listener.on_file_status(file_path, "翻译中")
+        self.log(f"\n开始翻译文件: {file_path}")
+
+        # 执行文件过滤
+        job = self.filter_file_content(file_path)
+        job.started_at = time.monotonic()
+        if float(self.config.job_deadline) > 0:
+            job.deadline = self.cancel_token.clock() + float(self.config.job_deadline)
+        batches = job.filtered_batches
+
+        self.log(f"\n{'='*60}")
+        self.log("翻译任务信息:")
+        self.log(f"{'─'*30}")
+        self.log(f"总章节数: {len(batches)}")
+        self.log(f"最大并发请求数: {self.request_engine.max_concurrency}")
+        self.log(f"总段落数: {job.total_paragraphs}")
+        self.log(f"{'─'*30}")
+
+        if self.config.passthrough_filter:
+            self.classify_passthrough(job)
+
+        self._prepare_glossary(job)
+        segments = self.plan_segments(job)
+        split_chapters = len(segments) - len(batches)
+        if split_chapters:
+            self.log(f"工作单元数: {len(segments)}（长章节拆分出 {split_chapters} 个并行片段）")
+
+        self.listener.on_file_parsed(file_path, batches)
+        self.progress.publish_file(file_path, 0, job.total_paragraphs)
+
+        # 打开任务日志，之前中断过的任务从断点继续
+        job.job_id = make_job_id(job.source_hash, self.config.model, self.prompt_key, self.config.temperature, file_path)
+        job.journal = JobJournal(os.path.join(self.config.cache_path, "journal"), job.job_id)
+        if job.journal.resumed_paragraphs:
+            self.log(f"从断点恢复: 已完成 {job.journal.resumed_paragraphs} 段，将跳过这些段落")
+        return job
+
+    def plan_file(self, file_path):
+        """解析文件并按当前的合并请求、上下文窗口设置模拟所有请求，不调用API，返回PlanEstimate"""
+        job = self.filter_file_content(file_path)
+        if self.config.passthrough_filter:
+            self.classify_passthrough(job)
+
+        estimate = PlanEstimate()
+        estimate.files = 1
+        estimate.chapters = len(job.filtered_batches)
+        estimate.paragraphs = job.total_paragraphs
+        self._prepare_glossary(job)
+        for segment in self.plan_segments(job):
+            context = self._create_context_window(job, segment)
+            units = []
+            for unit, _, passthrough_reason in self._plan_units(job, segment.chapter_index, segment.blocks, segment.first_number):
+                if passthrough_reason is None:
+                    units.append(unit)
+                else:
+                    estimate.passthrough_paragraphs += 1
+            estimate.simulate_chapter(context, units, self.config.model, int(self.config.max_tokens))
+        return estimate
+
+    def dry_run(self, file_queue):
+        """试运行：解析整个队列并估算请求数、token用量、费用和耗时，返回PlanEstimate"""
+        total = PlanEstimate()
+        per_file = []
+        for file_path in file_queue:
+            try:
+                estimate = self.plan_file(file_path)
+            except Exception as e:
+                self.log(f"文件 {file_path} 解析出错: {str(e)}", ERROR)
+                continue
+            per_file.append((file_path, estimate))
+            total.merge(estimate)
+
+        provider = self.config.api_provider
+        model = self.config.model
+        max_tokens = int(self.config.max_tokens)
+        wall_seconds = total.wall_seconds(
+            int(self.config.parallel_count), max_tokens,
+            int(self.config.requests_per_minute), int(self.config.tokens_per_minute))
+
+        self.log(f"\n{'='*60}")
+        self.log("试运行估算:")
+        self.log(f"{'─'*30}")
+        for file_path, estimate in per_file:
+            self.log(f"{os.path.basename(file_path)}: 请求 {estimate.requests} 次，"
+                     f"输入token约 {estimate.input_tokens}，输出token约 {estimate.translation_tokens}")
+        self.log(f"{'─'*30}")
+        self.log(f"文件数: {total.files}，章节数: {total.chapters}")
+        self.log(f"段落数: {total.paragraphs}（原样保留 {total.passthrough_paragraphs}）")
+        self.log(f"请求数: {total.requests}")
+        self.log(f"输入token约: {total.input_tokens}")
+        self.log(f"输出token约: {total.translation_tokens}（不含推理模型的思考过程）")
+        cost = estimate_cost(provider, model, total.input_tokens, total.translation_tokens)
+        if cost is None:
+            self.log(f"费用: 没有 {provider} {model} 的价格数据")
+        else:
+            self.log(f"费用约: {cost:.2f} 元（{provider} {model}，未计入缓存命中优惠）")
+        self.log(f"预计耗时: {wall_seconds / 60:.1f} 分钟（并发 {self.config.parallel_count}，"
+                 f"每分钟请求数上限 {self.config.requests_per_minute or '不限'}，"
+                 f"每分钟token上限 {self.config.tokens_per_minute or '不限'}）")
+        self.log(f"{'─'*30}")
+        self.log("相同token用量下各模型的费用:")
+        for (price_provider, price_model) in MODEL_PRICES:
+            model_cost = estimate_cost(price_provider, price_model, total.input_tokens, total.translation_tokens)
+            self.log(f"{price_provider} {price_model}: 约 {model_cost:.2f} 元")
+        self.log("注: 估算未计入翻译记忆和断点续传可复用的段落")
+        self.log(f"{'─'*30}")
+        return total
+
+    def classify_passthrough(self, job):
+        """标记不需要翻译的段落（纯图片、公式、网址、数字、图表编号、已是中文），翻译时原样保留"""
+        reason_counts = {}
+        translatable_count = 0
+        for _, blocks in job.filtered_batches:
+            for block in blocks:
+                if not block.translatable:
+                    continue
+                reason = classify(block.text)
+                if reason is None:
+                    translatable_count += 1
+                    continue
+                block.passthrough_reason = reason
+                reason_counts[reason] = reason_counts.get(reason, 0) + 1
+
+        job.passthrough_paragraphs = sum(reason_counts.values())
+        if not job.passthrough_paragraphs:
+            return
+        total = translatable_count + job.passthrough_paragraphs
+        self.log(f"\n{'='*60}")
+        self.log("免翻译内容:")
+        self.log(f"{'─'*30}")
+        self.log("，".join(f"{reason} {count}" for reason, count in reason_counts.items()))
+        self.log(f"共 {job.passthrough_paragraphs} 段原样保留，占待翻译段落的 {job.passthrough_paragraphs / total:.1%}，"
+                 f"实际需翻译 {translatable_count} 段")
+        self.log(f"{'─'*30}")
+
+    async def _translate_segment_in_pipeline(self, pipeline, job, segment):
+        """翻译工作单元，完成后释放流水线名额"""
+        try:
+            if self.should_stop:
+                return False
+            return await self.translate_segment(job, segment)
+        finally:
+            if pipeline is not None:
+                await pipeline.unit_done()
+
+    async def run_file(self, job, pipeline=None, work_queue=None):
+        """翻译已解析的文件并合并结果，返回FileJob；被停止时返回None
+
+        工作单元提交到全局工作队列，由空闲的worker按工作量从大到小取走；
+        没有传入队列时（单独翻译一个文件）使用临时队列。
+        """
+        file_path = job.file_path
+        own_queue = work_queue is None
+        if own_queue:
+            work_queue = WorkQueue(self.request_engine.max_concurrency, self.metrics)
+            work_queue.start()
+        try:
+            futures = []
+            for segment in job.segments:
+                futures.append(await work_queue.submit(
+                    segment.cost, functools.partial(self._translate_segment_in_pipeline, pipeline, job, segment)))
+            results = await asyncio.gather(*futures, return_exceptions=True)
+            for segment, result in zip(job.segments, results):
+                if isinstance(result, Exception):
+                    self.log(f"第 {segment.chapter_index} 章第 {segment.part_index} 部分处理失败: {str(result)}", ERROR)
+
+            if self.should_stop:
+                return None
+
+            if self._deadline_passed(job.deadline) or self._deadline_passed(self.task_deadline):
+                self.log(f"文件 {file_path} 超过截止时间，未完成的段落记为翻译失败，重新运行时从任务日志继续补译", ERROR)
+
+            if self.config.pack_paragraphs:
+                self.log(f"合并请求: {job.total_paragraphs} 段共发出 {job.request_units} 个翻译请求")
+            full_tokens = job.context_tokens_sent + job.context_tokens_saved
+            if full_tokens:
+                self.log(f"上下文窗口: 发送输入token约 {job.context_tokens_sent}，节省约 {job.context_tokens_saved}（{job.context_tokens_saved / full_tokens:.1%}）")
+
+            # 合并翻译结果
+            self.merge_translation_results(job)
+
+            # 所有段落都已完成时删除任务日志，否则保留以便重新运行时补译失败的段落
+            if job.completed_paragraphs >= job.total_paragraphs:
+                job.journal.discard()
+        finally:
+            job.journal.close()
+            if own_queue:
+                await work_queue.close()
+                self.log_scheduler_stats(work_queue)
+
+        self.log_file_metrics(job)
+        self.export_metrics()
+
+        # 更新文件状态
+        self.listener.on_file_status(file_path, "已完成")
+
+        self.log(f"\n{'='*60}")
+        self.log(f"文件 {file_path} 翻译完成！")
+        self.log(f"{'='*60}")
+        return job
+
+    async def translate_file(self, file_path, file_index=0):
+        """翻译单个文件，返回FileJob；被停止时返回None"""
+        job = self.prepare_file(file_path, file_index)
+        return await self.run_file(job)
+
+    async def translation_process_async(self, file_queue):
+        """翻译处理主协程，流水线翻译队列中的文件，返回成功完成的各文件FileJob"""
+        self.should_stop = False
+        self.cancel_token.reset()
+        self.cancel_token.attach(asyncio.get_running_loop())
+        self.task_deadline = None
+        if float(self.config.task_deadline) > 0:
+            self.task_deadline = self.cancel_token.clock() + float(self.config.task_deadline)
+        self.open_log_sink()
+        self.open_translation_memory()
+        try:
+            return await self._translate_queue(file_queue)
+        finally:
+            self.log_pool_stats()
+            self.log_usage_stats()
+            self.log_hedge_stats()
+            self.log_route_stats()
+            self.log_metrics_summary()
+            self.export_metrics()
+            await self.request_engine.aclose()
+            self.cancel_token.detach()
+            self.close_translation_memory()
+            self.close_log_sink()
+
+    def open_log_sink(self):
+        """按配置打开完整日志文件，打开失败时只输出到界面或控制台"""
+        if not self.config.log_file or self.log_sink is not None:
+            return
+        try:
+            self.log_sink = JsonlLogSink(self.config.log_file)
+            self.log(f"完整日志写入: {self.config.log_file}")
+        except Exception as e:
+            self.log(f"打开日志文件失败，将不写入完整日志: {str(e)}", WARNING)
+
+    def close_log_sink(self):
+        sink = self.log_sink
+        if sink is None:
+            return
+        self.log_sink = None
+        sink.close()
+
+    def open_translation_memory(self):
+        """按配置打开翻译记忆库，打开失败时不使用记忆库继续翻译"""
+        if not self.config.use_translation_memory or self.translation_memory is not None:
+            return
+        try:
+            self.translation_memory = TranslationMemory(
+                self.config.translation_memory_path,
+                max_entries=int(self.config.memory_max_entries),
+                max_age_days=int(self.config.memory_max_age_days)
+            )
+        except Exception as e:
+            self.log(f"打开翻译记忆库失败，将不使用翻译记忆: {str(e)}", WARNING)
+
+    def close_translation_memory(self):
+        """输出翻译记忆的命中情况并关闭记忆库"""
+        memory = self.translation_memory
+        if memory is None:
+            return
+        self.translation_memory = None
+        self.log(f"\n{'='*60}")
+        self.log("翻译记忆统计:")
+        self.log(f"{'─'*30}")
+        self.log(f"查询段落数: {memory.lookups}")
+        self.log(f"命中段落数: {memory.hits}（命中率 {memory.hit_rate:.1%}）")
+        self.log(f"节省token约: {memory.tokens_saved}")
+        self.log(f"{'─'*30}")
+        memory.close()
+
+    def log_scheduler_stats(self, work_queue):
+        """输出工作队列的worker利用率和空闲时间"""
+        stats = work_queue.stats()
+        if not stats or not stats["units"]:
+            return
+        self.log(f"\n{'='*60}")
+        self.log("调度统计:")
+        self.log(f"{'─'*30}")
+        self.log(f"worker数: {stats['workers']}，完成工作单元: {stats['units']}")
+        self.log(f"总耗时: {stats['wall_seconds']:.1f} 秒，worker忙碌合计 {stats['busy_seconds']:.1f} 秒，"
+                 f"空闲合计 {stats['idle_seconds']:.1f} 秒")
+        self.log(f"worker利用率: {stats['utilization']:.1%}，单个worker最长空闲 {stats['max_idle_seconds']:.1f} 秒")
+        self.log(f"{'─'*30}")
+
+    def log_file_metrics(self, job):
+        """输出单个文件各来源的段落数和用时"""
+        counts = {source: job.paragraph_counts.get(source, 0)
+                  for source in ("translated", "reused", "passthrough", "failed")}
+        self.log(f"段落: 调用API翻译 {counts['translated']}，复用已有译文 {counts['reused']}，"
+                 f"原样保留 {counts['passthrough']}，失败 {counts['failed']}")
+        if job.started_at is not None:
+            elapsed = time.monotonic() - job.started_at
+            speed = counts['translated'] / elapsed * 60 if elapsed > 0 else 0.0
+            self.log(f"用时: {elapsed:.1f} 秒，调用API翻译 {speed:.1f} 段/分钟")
+
+    def log_metrics_summary(self):
+        """按提供商和模型输出请求耗时分位数、排队等待、生成速度、错误和重试次数"""
+        routes = self.metrics.label_values("requests_total", "provider", "model")
+        if not routes:
+            return
+        self.log(f"\n{'='*60}")
+        self.log("请求指标:")
+        self.log(f"{'─'*30}")
+        for provider, model in routes:
+            labels = {"provider": provider, "model": model}
+            ok = self.metrics.counter_value("requests_total", outcome="ok", **labels)
+            failed = self.metrics.counter_value("requests_total", outcome="error", **labels)
+            retries = self.metrics.counter_value("retries_total", **labels)
+            self.log(f"{provider}/{model}: 成功 {ok} 次，失败 {failed} 次，重试 {retries} 次")
+            latency = self.metrics.histogram("request_seconds", outcome="ok", **labels)
+            if latency is not None:
+                self.log(f"  耗时: p50 {latency.quantile(0.5):.2f} 秒，p95 {latency.quantile(0.95):.2f} 秒，"
+                         f"p99 {latency.quantile(0.99):.2f} 秒，最长 {latency.max:.2f} 秒")
+            wait = self.metrics.histogram("request_wait_seconds", **labels)
+            if wait is not None:
+                self.log(f"  等待并发名额和限流: p50 {wait.quantile(0.5):.2f} 秒，p95 {wait.quantile(0.95):.2f} 秒")
+            speed = self.metrics.histogram("output_tokens_per_second", **labels)
+            if speed is not None:
+                self.log(f"  生成速度: 平均 {speed.mean:.1f} token/秒，p50 {speed.quantile(0.5):.1f} token/秒")
+            errors = self.metrics.label_values("request_errors_total", "provider", "model", "error")
+            error_counts = [f"{error} {self.metrics.counter_value('request_errors_total', error=error, **labels)} 次"
+                            for error_provider, error_model, error in errors
+                            if (error_provider, error_model) == (provider, model)]
+            if error_counts:
+                self.log(f"  错误: {'，'.join(error_counts)}")
+        completions = self.metrics.histogram("chat_completion_seconds")
+        if completions is not None:
+            failed = self.metrics.counter_value("chat_completions_total", outcome="failed")
+            self.log(f"含重试的完整请求: {completions.count} 次（最终失败 {failed} 次），"
+                     f"p50 {completions.quantile(0.5):.2f} 秒，p95 {completions.quantile(0.95):.2f} 秒")
+        queue_wait = self.metrics.histogram("queue_wait_seconds")
+        unit_seconds = self.metrics.histogram("work_unit_seconds")
+        if queue_wait is not None and unit_seconds is not None:
+            self.log(f"工作单元: 排队 p50 {queue_wait.quantile(0.5):.1f} 秒 / p95 {queue_wait.quantile(0.95):.1f} 秒，"
+                     f"执行 p50 {unit_seconds.quantile(0.5):.1f} 秒 / p95 {unit_seconds.quantile(0.95):.1f} 秒")
+        self.log(f"{'─'*30}")
+
+    def export_metrics(self):
+        """配置了metrics_path时写入指标文件"""
+        if not self.config.metrics_path:
+            return
+        try:
+            self.metrics.export(self.config.metrics_path)
+        except Exception as e:
+            self.log(f"导出指标失败: {str(e)}", WARNING)
+
+    def log_pool_stats(self):
+        """输出各提供商连接池的复用情况"""
+        pool_stats = self.request_engine.client_pool.stats()
+        if not pool_stats:
+            return
+        self.log(f"\n{'='*60}")
+        self.log("连接池统计:")
+        self.log(f"{'─'*30}")
+        for provider, stats in pool_stats.items():
+            self.log(f"{provider}: 请求数 {stats['requests']}，复用连接 {stats['hits']}，"
+                     f"新建连接 {stats['misses']}，命中率 {stats['hit_rate']:.1%}")
+        self.log(f"{'─'*30}")
+
+    def log_usage_stats(self):
+        """输出服务端返回的token用量及前缀缓存命中情况"""
+        usage = self.request_engine.usage
+        if not usage.requests:
+            return
+        self.log(f"\n{'='*60}")
+        self.log("Token用量统计:")
+        self.log(f"{'─'*30}")
+        self.log(f"请求数: {usage.requests}")
+        self.log(f"输入token: {usage.prompt_tokens}（缓存命中 {usage.cache_hit_tokens}，"
+                 f"未命中 {usage.cache_miss_tokens}，命中率 {usage.cache_hit_rate:.1%}）")
+        self.log(f"输出token: {usage.completion_tokens}")
+        self.log(f"{'─'*30}")
+
+    def log_hedge_stats(self):
+        """输出对冲请求的次数和胜出情况"""
+        policy = self.request_engine.hedge_policy
+        if policy is None or not policy.requests:
+            return
+        self.log(f"\n{'='*60}")
+        self.log("对冲请求统计:")
+        self.log(f"{'─'*30}")
+        self.log(f"请求数: {policy.requests}，对冲 {policy.hedged} 次（{policy.hedge_rate:.1%}），"
+                 f"对冲请求先完成 {policy.wins} 次（{policy.win_rate:.1%}）")
+        if policy.budget_denied:
+            self.log(f"因对冲预算用完未对冲: {policy.budget_denied} 次")
+        self.log(f"{'─'*30}")
+
+    def log_route_stats(self):
+        """配置了多条线路时输出各线路的请求分布、错误率和平均耗时"""
+        router = self.request_engine.router
+        if len(router.routes) < 2:
+            return
+        self.log(f"\n{'='*60}")
+        self.log("线路统计:")
+        self.log(f"{'─'*30}")
+        for stats in router.stats():
+            status = "（已停用）" if stats["disabled"] else ""
+            self.log(f"{stats['name']}{status}: 请求 {stats['requests']} 次（占 {stats['share']:.1%}），"
+                     f"失败 {stats['failures']} 次（{stats['error_rate']:.1%}），平均耗时 {stats['avg_seconds']:.1f} 秒")
+        self.log(f"转到其他线路重试: {router.failovers} 次")
+        self.log(f"{'─'*30}")
+
+    def _log_file_error(self, file_path, error):
+        self.log(f"\n{'='*60}")
+        self.log("错误信息:")
+        self.log(f"{'─'*30}")
+        self.log(f"文件 {file_path} 翻译出错: {str(error)}", ERROR)
+        self.log(f"{'─'*30}")
+        self.listener.on_file_status(file_path, "失败")
+
+    async def _run_file_in_pipeline(self, pipeline, work_queue, job):
+        """在流水线中翻译文件，出错时只影响该文件"""
+        try:
+            return await self.run_file(job, pipeline, work_queue)
+        except Exception as e:
+            self._log_file_error(job.file_path, e)
+            return None
+        finally:
+            await pipeline.release_file()
+
+    async def _translate_queue(self, file_queue):
+        """流水线翻译队列中的文件：有空闲请求名额时即开始下一个文件，各文件完成后独立合并"""
+        pipeline = FilePipeline(self.request_engine.max_concurrency, int(self.config.max_active_files))
+        work_queue = WorkQueue(self.request_engine.max_concurrency, self.metrics)
+        work_queue.start()
+        file_tasks = []
+        # 遍历文件队列
+        for i, file_path in enumerate(file_queue):
+            await pipeline.acquire_file()
+            if self.should_stop:
+                await pipeline.release_file()
+                break
+            try:
+                job = self.prepare_file(file_path, i)
+            except Exception as e:
+                self._log_file_error(file_path, e)
+                await pipeline.release_file()
+                continue
+            pipeline.add_units(len(job.segments))
+            file_tasks.append(asyncio.create_task(self._run_file_in_pipeline(pipeline, work_queue, job)))
+
+        results = await asyncio.gather(*file_tasks)
+        jobs = [job for job in results if job is not None]
+        await work_queue.close()
+        self.log_scheduler_stats(work_queue)
+
+        if self.should_stop:
+            self.log("翻译任务已停止")
+        else:
+            self.log(f"\n{'='*60}")
+            self.log("所有文件翻译完成！")
+            self.log(f"{'='*60}")
+        return jobs
+
+    def translation_process(self, file_queue):
+        """同步入口：在当前线程中运行事件循环完成整个翻译任务"""
+        return asyncio.run(self.translation_process_async(file_queue))